@@ -0,0 +1,333 @@
+import sys
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import threading
+import tracemalloc
+from pathlib import Path
+from statistics import quantiles
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from config import Config
+from locale_provider import Locale
+
+Locale.init(Config.locale)
+
+import discord
+from storage import Storage
+from extractor import Extractor
+from music_client import MusicClient
+from cache_store import CacheStore, AudioCache, SearchCache
+from guild_store import GuildStore
+from views import AskYesNoView, ChoicePlayOptionView
+from model import AddTrackTypes, LightContext
+from play import play_from_message, play, play_list
+
+
+BOT_ID = 1
+MEDIA_HOST = 'https://media.local'
+
+class FakeExtractor:
+	def __init__(self, latency: float, failure_rate: float, playlist_size: int) -> None:
+		self.latency = latency
+		self.failure_rate = failure_rate
+		self.playlist_size = playlist_size
+		self.calls = 0
+		self._lock = threading.Lock()
+
+	@staticmethod
+	def get_video_info(video_id: str) -> dict:
+		return {
+			'original_url': f'https://youtu.be/{video_id}',
+			'title': f'Track {video_id}',
+			'url': f'{MEDIA_HOST}/{video_id}.webm?expire={int(time.time()) + 6 * 3600}',
+			'acodec': 'opus'
+		}
+
+	@staticmethod
+	def get_flat_video_info(video_id: str) -> dict:
+		return {
+			'_type': 'url',
+			'id': video_id,
+			'url': f'https://www.youtube.com/watch?v={video_id}',
+			'title': f'Track {video_id}'
+		}
+
+	def extract_info(self, url: str, options: dict, cancel_event: threading.Event) -> dict | None:
+		with self._lock:
+			self.calls += 1
+		time.sleep(random.expovariate(1 / self.latency) if self.latency else 0)
+
+		if cancel_event.is_set() or random.random() < self.failure_rate:
+			return None
+		if url.startswith('ytsearch:'):
+			return {'entries': [{'id': f'{abs(hash(url)) % 10**11:011d}'}]}
+		if 'list=' in url:
+			playlist_id = url.split('list=')[1]
+			return {
+				'_type': 'playlist',
+				'original_url': url,
+				'title': f'Playlist {playlist_id}',
+				'entries': [
+					self.get_flat_video_info(video_id) if options.get('extract_flat') else self.get_video_info(video_id)
+					for video_id in (f'{playlist_id[-6:]}{i:05d}' for i in range(self.playlist_size))
+				]
+			}
+		return self.get_video_info(url.rsplit('/', 1)[-1][:11])
+
+class FakeAudioSource(discord.AudioSource):
+	def __init__(self, source: str) -> None:
+		self.source = source
+
+	def read(self) -> bytes:
+		return b''
+
+class FakeVoiceClient:
+	def __init__(self, channel: 'FakeVoiceChannel', stats: 'GuildStats', track_duration: float) -> None:
+		self.channel = channel
+		self.client = FakeClient()
+		self.stats = stats
+		self.track_duration = track_duration
+		self._loop = asyncio.get_running_loop()
+		self._handle: asyncio.TimerHandle = None
+		self._after = None
+		self._paused = False
+
+	def play(self, source: discord.AudioSource, after=None) -> None:
+		self.stats.on_play()
+		self._after = after
+		self._handle = self._loop.call_later(self.track_duration, self._finish)
+
+	def _finish(self) -> None:
+		self._handle = None
+		self.stats.on_track_end()
+		if (after := self._after):
+			self._after = None
+			threading.Thread(target=after, args=(None, )).start()
+
+	def is_playing(self) -> bool:
+		return self._handle is not None and not self._paused
+
+	def is_paused(self) -> bool:
+		return self._handle is not None and self._paused
+
+	def pause(self) -> None:
+		self._paused = True
+
+	def resume(self) -> None:
+		self._paused = False
+
+	def stop(self) -> None:
+		if self._handle:
+			self._handle.cancel()
+			self._finish()
+
+	async def disconnect(self, force: bool=False) -> None:
+		self.stop()
+
+class FakeUser:
+	id = BOT_ID
+
+class FakeClient:
+	user = FakeUser()
+
+class FakeMember:
+	def __init__(self, member_id: int, voice=None) -> None:
+		self.id = member_id
+		self.voice = voice
+		self.mention = f'<@{member_id}>'
+		self.name = f'user{member_id}'
+
+	async def edit(self, **kwargs) -> None:
+		pass
+
+class FakeVoiceChannel:
+	def __init__(self, stats: 'GuildStats', track_duration: float) -> None:
+		self.stats = stats
+		self.track_duration = track_duration
+		self.members = []
+
+	async def connect(self) -> FakeVoiceClient:
+		return FakeVoiceClient(self, self.stats, self.track_duration)
+
+class FakeVoiceState:
+	def __init__(self, channel: FakeVoiceChannel) -> None:
+		self.channel = channel
+
+class FakeMessage:
+	_next_id = 1
+
+	def __init__(self, channel: 'FakeTextChannel', content: str='', author: FakeMember=None, guild=None) -> None:
+		self.id = FakeMessage._next_id
+		FakeMessage._next_id += 1
+		self.channel = channel
+		self.content = content
+		self.author = author
+		self.guild = guild
+		self.attachments = []
+
+	async def edit(self, **kwargs) -> 'FakeMessage':
+		self.channel.edits += 1
+		return self
+
+	async def delete(self, delay: float=None) -> None:
+		pass
+
+class FakeTextChannel:
+	def __init__(self) -> None:
+		self.sent = 0
+		self.edits = 0
+
+	async def send(self, content=None, *, view=None, **kwargs) -> FakeMessage:
+		self.sent += 1
+		message = FakeMessage(self, content or '')
+		if view:
+			view.message = message
+		if isinstance(view, AskYesNoView):
+			await view.set_result(True)
+		elif isinstance(view, ChoicePlayOptionView):
+			await view.set_result(AddTrackTypes.ADD)
+		return message
+
+class FakeGuild:
+	def __init__(self, guild_id: int, author: FakeMember) -> None:
+		self.id = guild_id
+		self.members = [FakeMember(BOT_ID), author]
+
+class GuildStats:
+	def __init__(self) -> None:
+		self.request_time: float = None
+		self.first_audio_time: float = None
+		self.track_end_time: float = None
+		self.gaps: List[float] = []
+		self.tracks_played = 0
+
+	def on_play(self) -> None:
+		now = time.perf_counter()
+		self.tracks_played += 1
+		if self.first_audio_time is None:
+			self.first_audio_time = now
+		elif self.track_end_time is not None:
+			self.gaps.append(now - self.track_end_time)
+
+	def on_track_end(self) -> None:
+		self.track_end_time = time.perf_counter()
+
+	@property
+	def time_to_first_audio(self) -> float | None:
+		if self.first_audio_time is None:
+			return None
+		return self.first_audio_time - self.request_time
+
+class LoopLagMonitor:
+	def __init__(self, interval: float=.01) -> None:
+		self.interval = interval
+		self.samples: List[float] = []
+		self._task: asyncio.Task = None
+
+	async def _run(self) -> None:
+		while True:
+			started = time.perf_counter()
+			await asyncio.sleep(self.interval)
+			self.samples.append(max(time.perf_counter() - started - self.interval, 0))
+
+	def start(self) -> None:
+		self._task = asyncio.create_task(self._run())
+
+	def stop(self) -> None:
+		self._task.cancel()
+
+def prepare_storage(data_path: Path) -> None:
+	Storage._data_path = data_path
+	Storage.guild_store = GuildStore(data_path / 'guilds')
+	Storage.audio_cache = AudioCache(data_path / 'audio_cache.db')
+	Storage.video_titles = CacheStore(data_path / 'video_titles.db')
+	Storage.search_cache = SearchCache(data_path / 'search_cache.db')
+	Storage.audio_cache.load()
+	Storage.video_titles.load()
+	Storage.search_cache.load()
+
+async def run_guild(guild_id: int, args: argparse.Namespace, stats: GuildStats) -> None:
+	voice_channel = FakeVoiceChannel(stats, args.track_duration)
+	author = FakeMember(1000 + guild_id, FakeVoiceState(voice_channel))
+	guild = FakeGuild(guild_id, author)
+	text_channel = FakeTextChannel()
+	Storage.dj_channels[guild_id] = text_channel
+	ctx = LightContext(author, text_channel, guild)
+
+	video_ids = [f'{guild_id:05d}{i:06d}' for i in range(args.tracks)]
+	stats.request_time = time.perf_counter()
+
+	playback = asyncio.create_task(
+		play_from_message(FakeMessage(text_channel, f'https://youtu.be/{video_ids[0]}', author, guild))
+	)
+	await asyncio.sleep(args.track_duration / 2)
+	await play(ctx, f'https://www.youtube.com/playlist?list=PL{guild_id:06d}', False, False, False)
+	await play_list(ctx, ', '.join(f'https://youtu.be/{video_id}' for video_id in video_ids[1:]), [], False, False, False)
+	await play_from_message(FakeMessage(text_channel, f'song {guild_id}', author, guild))
+	await playback
+
+def percentiles(values: List[float]) -> str:
+	if len(values) < 2:
+		return 'n/a'
+	points = quantiles(values, n=100, method='inclusive')
+	return ' / '.join(f'{points[index] * 1000:.1f}' for index in (49, 94, 98)) + f' / {max(values) * 1000:.1f}'
+
+async def main(args: argparse.Namespace) -> None:
+	fake_extractor = FakeExtractor(args.latency, args.failure_rate, args.playlist_size)
+	Extractor._extract_info = staticmethod(fake_extractor.extract_info)
+	MusicClient._create_audio_source = lambda self, track, source: asyncio.sleep(0, FakeAudioSource(source))
+
+	with tempfile.TemporaryDirectory() as data_path:
+		prepare_storage(Path(data_path))
+		guild_stats = {guild_id: GuildStats() for guild_id in range(1, args.guilds + 1)}
+
+		lag_monitor = LoopLagMonitor()
+		tracemalloc.start()
+		lag_monitor.start()
+		started = time.perf_counter()
+
+		results = await asyncio.gather(
+			*(run_guild(guild_id, args, stats) for guild_id, stats in guild_stats.items()),
+			return_exceptions=True
+		)
+
+		elapsed = time.perf_counter() - started
+		lag_monitor.stop()
+		_, memory_peak = tracemalloc.get_traced_memory()
+		tracemalloc.stop()
+		Storage.audio_cache.close()
+		Storage.video_titles.close()
+		Storage.search_cache.close()
+
+	errors = [result for result in results if isinstance(result, BaseException)]
+	first_audio = [stats.time_to_first_audio for stats in guild_stats.values() if stats.time_to_first_audio is not None]
+	gaps = [gap for stats in guild_stats.values() for gap in stats.gaps]
+
+	print(f'guilds: {args.guilds}, elapsed: {elapsed:.2f} s, errors: {len(errors)}')
+	print(f'extractor calls: {fake_extractor.calls}, tracks played: {sum(stats.tracks_played for stats in guild_stats.values())}')
+	print(f'time to first audio, ms (p50 / p95 / p99 / max): {percentiles(first_audio)}')
+	print(f'inter-track gap, ms (p50 / p95 / p99 / max):     {percentiles(gaps)}')
+	print(f'event loop lag, ms (p50 / p95 / p99 / max):      {percentiles(lag_monitor.samples)}')
+	print(f'traced memory peak: {memory_peak / 2**20:.1f} MB')
+	for error in errors[:5]:
+		print(f'error: {error!r}')
+
+def parse_args() -> argparse.Namespace:
+	parser = argparse.ArgumentParser(description='Offline load test with simulated guilds, voice clients and yt-dlp')
+	parser.add_argument('--guilds', type=int, default=50)
+	parser.add_argument('--tracks', type=int, default=5, help='single tracks requested per guild')
+	parser.add_argument('--playlist-size', type=int, default=20)
+	parser.add_argument('--track-duration', type=float, default=.5, help='simulated track length in seconds')
+	parser.add_argument('--latency', type=float, default=.2, help='mean simulated extraction latency in seconds')
+	parser.add_argument('--failure-rate', type=float, default=0)
+	return parser.parse_args()
+
+
+if __name__ == '__main__':
+	random.seed(0)
+	asyncio.run(main(parse_args()))
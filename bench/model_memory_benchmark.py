@@ -0,0 +1,92 @@
+import sys
+import random
+import tracemalloc
+from copy import deepcopy
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from model import Track, Playlist
+
+
+TRACKS_COUNT = 100_000
+UNIQUE_TRACKS_COUNT = 40_000
+PLAYLIST_SIZE = 100
+
+class LegacyTrack:
+	def __init__(self, url: str, title: str, source: str=None):
+		self.url = url
+		self.title = title
+		self.source = source
+
+	def get_dict(self) -> dict:
+		dict_to_save = self.__dict__.copy()
+		dict_to_save.pop('source')
+		return dict_to_save
+
+class LegacyPlaylist:
+	def __init__(self, url: str, title: str, entries: List[LegacyTrack]=None):
+		self.url = url
+		self.title = title
+		self.entries = entries or []
+
+	def get_dict(self) -> dict:
+		cache_item_dict = deepcopy(self.__dict__)
+		cache_item_dict['entries'] = [track.get_dict() for track in self.entries]
+		return cache_item_dict
+
+def generate_raw_cache() -> dict:
+	video_ids = [f'{i:011d}' for i in range(UNIQUE_TRACKS_COUNT)]
+	raw_cache = {}
+
+	for playlist_index in range(TRACKS_COUNT // PLAYLIST_SIZE):
+		url = f'https://www.youtube.com/playlist?list=PL{playlist_index:032d}'
+		raw_cache[url] = {
+			'url': url,
+			'title': f'Playlist {playlist_index}',
+			'entries': [
+				{'url': f'https://youtu.be/{video_id}', 'title': f'Track title {video_id}'}
+				for video_id in random.choices(video_ids, k=PLAYLIST_SIZE)
+			]
+		}
+	return raw_cache
+
+def load_legacy(raw_cache: dict) -> dict:
+	return {
+		url: LegacyPlaylist(data['url'], data['title'], [LegacyTrack(**track) for track in data['entries']])
+		for url, data in raw_cache.items()
+	}
+
+def load_slotted(raw_cache: dict) -> dict:
+	return {
+		url: Playlist(data['url'], data['title'], [Track.create(**track) for track in data['entries']])
+		for url, data in raw_cache.items()
+	}
+
+def measure(loader, raw_cache: dict) -> int:
+	tracemalloc.start()
+	cache = loader(raw_cache)
+	size, _ = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+
+	tracemalloc.start()
+	for item in cache.values():
+		item.get_dict()
+	_, serialize_peak = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return size, serialize_peak
+
+def main() -> None:
+	random.seed(0)
+	raw_cache = generate_raw_cache()
+	print(f'{TRACKS_COUNT:,} playlist entries, {UNIQUE_TRACKS_COUNT:,} unique tracks\n')
+	print(f'{"model":<10}{"cache size":>16}{"get_dict peak":>18}')
+
+	for name, loader in (('legacy', load_legacy), ('slotted', load_slotted)):
+		size, serialize_peak = measure(loader, raw_cache)
+		print(f'{name:<10}{size / 2**20:>13.1f} MB{serialize_peak / 2**20:>15.1f} MB')
+
+
+if __name__ == '__main__':
+	main()
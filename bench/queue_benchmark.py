@@ -0,0 +1,63 @@
+import sys
+import random
+from pathlib import Path
+from timeit import timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'src'))
+
+from music_queue import MusicQueue
+
+
+SIZES = (1_000, 10_000, 100_000)
+REPEATS = 200
+BATCH = [object() for _ in range(10)]
+
+def create_queue(size: int) -> MusicQueue:
+	queue = MusicQueue()
+	queue.add(object() for _ in range(size))
+	queue.seek(size // 2)
+	return queue
+
+def list_insert(queue: list, track_index: int) -> list:
+	return queue[:track_index+1] + BATCH + queue[track_index+1:]
+
+def list_add(queue: list) -> list:
+	return queue + BATCH
+
+def measure(statement) -> float:
+	return timeit(statement, number=REPEATS) / REPEATS * 1_000_000
+
+def main() -> None:
+	print(f'{"operation":<28}' + ''.join(f'{size:>14,}' for size in SIZES))
+	print(f'{"":<28}' + ''.join(f'{"(us/op)":>14}' for _ in SIZES))
+
+	benchmarks = {
+		'MusicQueue.add': lambda size: measure(lambda: queue.add(BATCH)),
+		'MusicQueue.insert_next': lambda size: measure(lambda: queue.insert_next(BATCH)),
+		'MusicQueue.current/next': lambda size: measure(lambda: (queue.current, queue.next_track)),
+		'MusicQueue.advance': lambda size: measure(queue.advance),
+		'MusicQueue.get_upcoming(2)': lambda size: measure(lambda: queue.get_upcoming(2)),
+		'list slice insert (old)': lambda size: measure(lambda: list_insert(items, size // 2)),
+		'list concat add (old)': lambda size: measure(lambda: list_add(items)),
+	}
+
+	for name, benchmark in benchmarks.items():
+		row = f'{name:<28}'
+		for size in SIZES:
+			global queue, items
+			queue = create_queue(size)
+			items = [object() for _ in range(size)]
+			row += f'{benchmark(size):>14.2f}'
+		print(row)
+
+	print('\nmix_with_upcoming shuffles the whole tail, so its cost is linear by design:')
+	row = f'{"MusicQueue.mix_with_upcoming":<28}'
+	for size in SIZES:
+		queue = create_queue(size)
+		row += f'{measure(lambda: queue.mix_with_upcoming(BATCH)):>14.2f}'
+	print(row)
+
+
+if __name__ == '__main__':
+	random.seed(0)
+	main()
@@ -0,0 +1,182 @@
+import json
+import time
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, MutableMapping, Union
+from config import Config
+from metrics import Metrics
+from model import Playlist, Track
+
+
+class CacheStore(MutableMapping):
+	def __init__(self, path: Path, table: str='cache') -> None:
+		self._path = path
+		self._table = table
+		self._connection: sqlite3.Connection = None
+		self._items: Dict[str, Any] = {}
+
+	def open(self) -> None:
+		if self._connection:
+			return
+		self._connection = sqlite3.connect(self._path, isolation_level=None)
+		self._connection.execute('PRAGMA journal_mode=WAL')
+		self._connection.execute('PRAGMA synchronous=NORMAL')
+		self._connection.execute(f'CREATE TABLE IF NOT EXISTS {self._table} (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+
+	def close(self) -> None:
+		if self._connection:
+			self._connection.close()
+			self._connection = None
+
+	def load(self) -> None:
+		self.open()
+		self._items = {}
+
+	def update_many(self, items: Dict[str, Any]) -> None:
+		self.open()
+		with Metrics.persistence_write_seconds.time(self._path.stem), self._connection:
+			self._connection.execute('BEGIN')
+			self._connection.executemany(
+				f'INSERT OR REPLACE INTO {self._table} (key, value) VALUES (?, ?)',
+				((key, self._encode(value)) for key, value in items.items())
+			)
+		self._items.update(items)
+
+	def _encode(self, value: Any) -> str:
+		return json.dumps(value, ensure_ascii=False)
+
+	def _decode(self, data: str) -> Any:
+		return json.loads(data)
+
+	def _load_item(self, key: str) -> bool:
+		self.open()
+		row = self._connection.execute(f'SELECT value FROM {self._table} WHERE key = ?', (key,)).fetchone()
+		if not row:
+			return False
+		self._items[key] = self._decode(row[0])
+		return True
+
+	def _has_key(self, key: str) -> bool:
+		self.open()
+		if self._connection.execute(f'SELECT 1 FROM {self._table} WHERE key = ?', (key,)).fetchone():
+			return True
+		self._items.pop(key, None)
+		return False
+
+	def __getitem__(self, key: str) -> Any:
+		if key in self._items:
+			if not self._has_key(key):
+				raise KeyError(key)
+		elif not self._load_item(key):
+			raise KeyError(key)
+		return self._items[key]
+
+	def __setitem__(self, key: str, value: Any) -> None:
+		self.open()
+		data = self._encode(value)
+		with Metrics.persistence_write_seconds.time(self._path.stem):
+			self._connection.execute(
+				f'INSERT OR REPLACE INTO {self._table} (key, value) VALUES (?, ?)',
+				(key, data)
+			)
+		self._items[key] = value
+
+	def __delitem__(self, key: str) -> None:
+		self.open()
+		with Metrics.persistence_write_seconds.time(self._path.stem):
+			deleted = self._connection.execute(f'DELETE FROM {self._table} WHERE key = ?', (key,)).rowcount
+		self._items.pop(key, None)
+		if not deleted:
+			raise KeyError(key)
+
+	def __contains__(self, key: object) -> bool:
+		return self._has_key(key) if key in self._items else self._load_item(key)
+
+	def __iter__(self) -> Iterator[str]:
+		self.open()
+		return (key for key, in self._connection.execute(f'SELECT key FROM {self._table}').fetchall())
+
+	def __len__(self) -> int:
+		self.open()
+		return self._connection.execute(f'SELECT COUNT(*) FROM {self._table}').fetchone()[0]
+
+	def clear(self) -> None:
+		self.open()
+		with Metrics.persistence_write_seconds.time(self._path.stem):
+			self._connection.execute(f'DELETE FROM {self._table}')
+		self._items.clear()
+
+class AudioCache(CacheStore):
+	def _encode(self, value: Union[Track, Playlist]) -> str:
+		return super()._encode(value.get_dict())
+
+	def _decode(self, data: str) -> Union[Track, Playlist]:
+		return self.from_dict(super()._decode(data))
+
+	@staticmethod
+	def from_dict(data: dict) -> Union[Track, Playlist]:
+		if not data.get('entries'):
+			return Track.create(**data)
+
+		return Playlist(
+			url=data.get('url'),
+			title=data.get('title'),
+			entries=[Track.create(**track_data) for track_data in data.get('entries')]
+		)
+
+class SearchCache(CacheStore):
+	def __init__(self, path: Path, table: str='cache') -> None:
+		super().__init__(path, table)
+		self._added_since_eviction = 0
+
+	@staticmethod
+	def normalize_query(query: str) -> str:
+		return ' '.join(query.casefold().split())
+
+	@staticmethod
+	def get_ttl() -> int:
+		return Config.search_cache_ttl_hours * 3600
+
+	@staticmethod
+	def get_eviction_batch() -> int:
+		return max(Config.search_cache_size // 10, 1)
+
+	def load(self) -> None:
+		self.open()
+		self._connection.execute(
+			f"CREATE INDEX IF NOT EXISTS {self._table}_created_at ON {self._table} (json_extract(value, '$[1]'))"
+		)
+		self._connection.execute(
+			f"DELETE FROM {self._table} WHERE json_extract(value, '$[1]') < ?",
+			(time.time() - self.get_ttl(), )
+		)
+		super().load()
+
+	def get_video_id(self, query: str) -> str | None:
+		key = self.normalize_query(query)
+		if not (entry := self.get(key)):
+			return None
+
+		video_id, created_at = entry
+		if time.time() - created_at > self.get_ttl():
+			del self[key]
+			return None
+		return video_id
+
+	def add(self, query: str, video_id: str) -> None:
+		self[self.normalize_query(query)] = [video_id, int(time.time())]
+
+		# the size is checked once per batch of new queries, so the cache may go over the limit by one batch
+		self._added_since_eviction += 1
+		if self._added_since_eviction < self.get_eviction_batch():
+			return
+		self._added_since_eviction = 0
+
+		if (overflow := len(self) - Config.search_cache_size) > 0:
+			with Metrics.persistence_write_seconds.time(self._path.stem):
+				self._connection.execute(
+					f"""DELETE FROM {self._table} WHERE key IN (
+						SELECT key FROM {self._table} ORDER BY json_extract(value, '$[1]') LIMIT ?
+					)""",
+					(overflow, )
+				)
@@ -10,6 +10,22 @@ class Config:
     guild_ids: List[int] = []
     playlistend: int = 100
     locale: str = 'en_us'
+    extract_workers: int = 4
+    extract_timeout: int = 180
+    title_requests_concurrency: int = 8
+    prefetch_count: int = 2
+    play_list_concurrency: int = 4
+    ignore_case_names_search: bool = False
+    audio_file_cache_size_mb: int = 0
+    audio_file_cache_min_plays: int = 3
+    opus_passthrough: bool = True
+    shard_count: int = 1
+    worker_processes: int = 1
+    metrics_host: str = '127.0.0.1'
+    metrics_port: int = 0
+    loop_block_threshold: float = 0.5
+    search_cache_ttl_hours: int = 72
+    search_cache_size: int = 10000
 
     @classmethod
     def load_config(cls):
@@ -18,4 +34,20 @@ class Config:
             cls.token = data['token']
             cls.guild_ids = data['guild_ids']
             cls.playlistend = data['playlistend']
-            cls.locale = data['locale']
\ No newline at end of file
+            cls.locale = data['locale']
+            cls.extract_workers = data.get('extract_workers', cls.extract_workers)
+            cls.extract_timeout = data.get('extract_timeout', cls.extract_timeout)
+            cls.title_requests_concurrency = data.get('title_requests_concurrency', cls.title_requests_concurrency)
+            cls.prefetch_count = data.get('prefetch_count', cls.prefetch_count)
+            cls.play_list_concurrency = data.get('play_list_concurrency', cls.play_list_concurrency)
+            cls.ignore_case_names_search = data.get('ignore_case_names_search', cls.ignore_case_names_search)
+            cls.audio_file_cache_size_mb = data.get('audio_file_cache_size_mb', cls.audio_file_cache_size_mb)
+            cls.audio_file_cache_min_plays = data.get('audio_file_cache_min_plays', cls.audio_file_cache_min_plays)
+            cls.opus_passthrough = data.get('opus_passthrough', cls.opus_passthrough)
+            cls.shard_count = data.get('shard_count', cls.shard_count)
+            cls.worker_processes = data.get('worker_processes', cls.worker_processes)
+            cls.metrics_host = data.get('metrics_host', cls.metrics_host)
+            cls.metrics_port = data.get('metrics_port', cls.metrics_port)
+            cls.loop_block_threshold = data.get('loop_block_threshold', cls.loop_block_threshold)
+            cls.search_cache_ttl_hours = data.get('search_cache_ttl_hours', cls.search_cache_ttl_hours)
+            cls.search_cache_size = data.get('search_cache_size', cls.search_cache_size)
\ No newline at end of file
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from yt_dlp import YoutubeDL
+from config import Config
+from metrics import Metrics
+from model import YDL_OPTIONS
+
+
+class ExtractionCancelled(Exception):
+	pass
+
+class CancellableYoutubeDL(YoutubeDL):
+	def __init__(self, params: dict, cancel_event: threading.Event) -> None:
+		super().__init__(params)
+		self._cancel_event = cancel_event
+
+	def urlopen(self, req):
+		if self._cancel_event.is_set():
+			raise ExtractionCancelled()
+		return super().urlopen(req)
+
+class Extractor:
+	_executor: ThreadPoolExecutor = None
+
+	@classmethod
+	def _get_executor(cls) -> ThreadPoolExecutor:
+		if not cls._executor:
+			cls._executor = ThreadPoolExecutor(
+				max_workers=Config.extract_workers, 
+				thread_name_prefix='extractor'
+			)
+		return cls._executor
+
+	@staticmethod
+	def _extract_info(url: str, options: dict, cancel_event: threading.Event) -> dict | None:
+		if cancel_event.is_set():
+			return None
+		with CancellableYoutubeDL(options, cancel_event) as ydl:
+			return ydl.extract_info(url, download=False)
+
+	@classmethod
+	async def extract_info(
+		cls, 
+		url: str, 
+		options: dict=YDL_OPTIONS, 
+		timeout: float=None, 
+		call_site: str='other'
+		) -> dict | None:
+		cancel_event = threading.Event()
+		future = asyncio.get_running_loop().run_in_executor(
+			cls._get_executor(), 
+			cls._extract_info, 
+			url, 
+			options, 
+			cancel_event
+		)
+
+		try:
+			with Metrics.extraction_seconds.time(call_site):
+				return await asyncio.wait_for(future, timeout or Config.extract_timeout)
+		except BaseException:
+			cancel_event.set()
+			raise
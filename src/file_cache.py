@@ -0,0 +1,161 @@
+import os
+import asyncio
+import aiohttp
+from hashlib import sha1
+from pathlib import Path
+from collections import OrderedDict
+from typing import Dict, Set, Union
+from config import Config
+from http_client import HttpClient
+from model import Track, TrackFile
+
+
+class AudioFileCache:
+	__base_path = Path(__file__).resolve().parent
+	_directory = __base_path.parent / 'data/audio_files'
+	_download_timeout = 600
+
+	_files: OrderedDict[str, int] = OrderedDict()
+	_size: int = 0
+	_play_counts: Dict[str, int] = {}
+	_skipped_keys: Set[str] = set()
+	_downloads: Dict[str, asyncio.Task] = {}
+
+	@classmethod
+	def get_max_size(cls) -> int:
+		return Config.audio_file_cache_size_mb * 2**20
+
+	@classmethod
+	def is_enabled(cls) -> bool:
+		return cls.get_max_size() > 0
+
+	@staticmethod
+	def _get_key(track: Union[Track, TrackFile]) -> str:
+		url = track.url.split('?')[0] if isinstance(track, TrackFile) else track.url
+		return sha1(url.encode('utf-8')).hexdigest()
+
+	@classmethod
+	def _get_path(cls, key: str) -> Path:
+		return cls._directory / key
+
+	@classmethod
+	def load(cls) -> None:
+		if not cls.is_enabled():
+			return
+
+		os.makedirs(cls._directory, exist_ok=True)
+		for entry in os.scandir(cls._directory):
+			if entry.name.endswith('.part'):
+				os.remove(entry.path)
+		cls._evict()
+
+	@classmethod
+	def _scan(cls) -> None:
+		files = []
+		for entry in os.scandir(cls._directory):
+			if entry.name.endswith('.part'):
+				continue
+			try:
+				stat = entry.stat()
+			except OSError:
+				continue
+			files.append((stat.st_mtime, entry.name, stat.st_size))
+
+		cls._files = OrderedDict((name, size) for _, name, size in sorted(files))
+		cls._size = sum(cls._files.values())
+
+	@classmethod
+	def contains(cls, track: Union[Track, TrackFile]) -> bool:
+		return bool(cls._files) and cls._get_key(track) in cls._files
+
+	@classmethod
+	def get_path(cls, track: Union[Track, TrackFile]) -> str | None:
+		if (key := cls._get_key(track)) not in cls._files:
+			return None
+
+		path = cls._get_path(key)
+		try:
+			os.utime(path)
+		except OSError:
+			cls._remove(key)
+			return None
+
+		cls._files.move_to_end(key)
+		return str(path)
+
+	@classmethod
+	def register_play(cls, track: Union[Track, TrackFile], source: str) -> None:
+		if not cls.is_enabled() or not source:
+			return
+
+		key = cls._get_key(track)
+		cls._play_counts[key] = cls._play_counts.get(key, 0) + 1
+
+		if key in cls._files or key in cls._downloads or key in cls._skipped_keys:
+			return
+		if not isinstance(track, TrackFile) and cls._play_counts[key] < Config.audio_file_cache_min_plays:
+			return
+		# another worker process may have saved this file already
+		if cls._add_existing(key):
+			cls._play_counts.pop(key, None)
+			return
+		cls._downloads[key] = asyncio.create_task(cls._download(key, source))
+
+	@classmethod
+	async def _download(cls, key: str, source: str) -> None:
+		path = cls._get_path(key)
+		temp_path = path.with_name(f'{key}.part')
+		size = 0
+
+		try:
+			async with HttpClient.get_session().get(
+				source,
+				timeout=aiohttp.ClientTimeout(total=cls._download_timeout)
+			) as response:
+				response.raise_for_status()
+				if (response.content_length or 0) > cls.get_max_size():
+					return cls._skipped_keys.add(key)
+
+				with open(temp_path, 'wb') as file:
+					async for chunk in response.content.iter_chunked(2**16):
+						size += len(chunk)
+						if size > cls.get_max_size():
+							return cls._skipped_keys.add(key)
+						file.write(chunk)
+
+			os.replace(temp_path, path)
+			cls._files[key] = size
+			cls._size += size
+			cls._evict()
+		except Exception as e:
+			print(f'Audio file download error [{source}]: {e!r}')
+		finally:
+			cls._downloads.pop(key, None)
+			cls._play_counts.pop(key, None)
+			if os.path.exists(temp_path):
+				os.remove(temp_path)
+
+	@classmethod
+	def _add_existing(cls, key: str) -> bool:
+		try:
+			size = os.path.getsize(cls._get_path(key))
+		except OSError:
+			return False
+		cls._files[key] = size
+		cls._size += size
+		return True
+
+	@classmethod
+	def _remove(cls, key: str) -> None:
+		cls._size -= cls._files.pop(key, 0)
+		try:
+			os.remove(cls._get_path(key))
+		except OSError:
+			pass
+
+	@classmethod
+	def _evict(cls) -> None:
+		# the directory is shared by all worker processes, so the budget is checked against its actual contents
+		cls._scan()
+		while cls._files and cls._size > cls.get_max_size():
+			cls._remove(next(iter(cls._files)))
@@ -1,12 +1,13 @@
-import re
-import json
+import asyncio
 import discord
-from urllib.request import urlopen
-from urllib.parse import urlencode
-from yt_dlp import YoutubeDL
-from typing import Union, Set, List
+from typing import Union, List
+from config import Config
 from music_client import MusicClient
 from storage import Storage
+from extractor import Extractor
+from metrics import Metrics
+from http_client import HttpClient
+from url_parser import parse_url
 from views import AskYesNoView
 from locale_provider import LocaleKeys, translate
 from model import (
@@ -14,19 +15,21 @@ from model import (
 	TrackFile, 
     Playlist, 
     ErrorPlayArgument,
-    YDL_OPTIONS,
-	LightContext
+	LightContext,
+	YDL_FLAT_OPTIONS
 )
 
 
+title_requests_semaphore = asyncio.Semaphore(Config.title_requests_concurrency)
+
 def get_music_client(guild: discord.Guild) -> MusicClient:
 	if guild.id not in Storage.music_clients.keys():
 		Storage.music_clients[guild.id] = MusicClient(Storage.dj_channels.get(guild.id))
 	return Storage.music_clients[guild.id]
 
-async def get_tracknames(ctx) -> Set[str]:
-	key = ctx.options.get('name') or ctx.options.get('url_or_name')
-	return {name for name in list(Storage.get_guild_saved_urls(ctx)) if name.startswith(key)}
+async def get_tracknames(ctx) -> List[str]:
+	key = ctx.options.get('name') or ctx.options.get('url_or_name') or ''
+	return Storage.get_guild_names_index(ctx).find(key)
 
 def get_data_type(is_playlist: bool) -> str:
 	return PlayEmbedTypes.PLAYLIST if is_playlist else PlayEmbedTypes.VIDEO
@@ -62,60 +65,66 @@ async def prepare_request(ctx: Union[discord.ApplicationContext, LightContext],
 	return request
 
 def is_playlist_url(url: str) -> bool:
-	if url in Storage.audio_cache:
-		return isinstance(Storage.audio_cache[url], Playlist)
-	if 'yandex' in url:
-		return not 'track' in url
-	return any(map(lambda x: x in url, ('/playlist', '/channel', '@', '/videos'))) or any(map(lambda x: url.endswith(x), ('/videos', '/shorts')))
+	parsed_url = parse_url(url)
+	if parsed_url.url in Storage.audio_cache:
+		return isinstance(Storage.audio_cache[parsed_url.url], Playlist)
+	return parsed_url.is_playlist
 
-def parse_video_url(ctx: Union[discord.ApplicationContext, LightContext], url_or_name: str) -> str:
+async def parse_video_url(ctx: Union[discord.ApplicationContext, LightContext], url_or_name: str) -> str:
 	saved_urls = Storage.get_guild_saved_urls(ctx)
 	
 	if url_or_name in saved_urls:
 		return saved_urls[url_or_name]
 	elif not url_or_name.startswith('http') and url_or_name and not url_or_name.isspace():
-		with YoutubeDL(YDL_OPTIONS) as ydl:
-			info = ydl.extract_info(f'ytsearch:{url_or_name}', download=False)
-		return 'https://youtu.be/' + info['entries'][0]['id'] if (info and info['entries']) else ErrorPlayArgument(url_or_name)
+		if (video_id := Storage.search_cache.get_video_id(url_or_name)):
+			Metrics.search_cache_requests.inc('hit')
+			return 'https://youtu.be/' + video_id
+		Metrics.search_cache_requests.inc('miss')
+
+		try:
+			info = await Extractor.extract_info(f'ytsearch:{url_or_name}', YDL_FLAT_OPTIONS, call_site='parse_video_url_search')
+		except Exception as e:
+			print(f'Can\'t find video by query [{url_or_name}]: {e!r}')
+			info = None
+		if not (info and info['entries'] and info['entries'][0]):
+			return ErrorPlayArgument(url_or_name)
+
+		video_id = info['entries'][0]['id']
+		Storage.search_cache.add(url_or_name, video_id)
+		return 'https://youtu.be/' + video_id
 	return prepare_url(url_or_name)
 
 def get_youtube_video_id(url: str) -> str:
-	pattern = r'(?:https?:\/\/)?(?:[0-9A-Z-]+\.)?(?:youtube|youtu|youtube-nocookie)\.(?:com|be)\/(?:watch\?v=|watch\?.+&v=|embed\/|v\/|.+\?v=)?([^&=\n%\?]{11})'
-	return re.findall(pattern, url, re.MULTILINE | re.IGNORECASE)[0]
-
-def get_youtube_playlist_id(url: str) -> str:
-	return re.findall('[&?]list=([^&]+)', url)[0]
+	if not (video_id := parse_url(url).video_id):
+		raise ValueError(f'Not a YouTube video url: {url}')
+	return video_id
 
 def prepare_url(url: str) -> str:
-	if not re.search('youtu|youtube', url):
-		return url
-	if is_playlist_url(url):
-		if not '/playlist' in url:
-			return url
-		return 'https://www.youtube.com/playlist?list='+get_youtube_playlist_id(url)
+	return parse_url(url).url if url else url
 
-	result = 'https://youtu.be/' + get_youtube_video_id(url)
-	if len(timecode := re.findall('[?|&]t=\d{1,}', url)):
-		result += timecode[0]
-	return result
-
-def get_video_title(url: str) -> str:
+def get_cached_video_title(url: str) -> str | None:
+	url = prepare_url(url)
 	if is_playlist_url(url):
 		if url in Storage.audio_cache:
 			return f'{Storage.audio_cache[url].title} ({translate(LocaleKeys.Label.playlist).title()})'
 		return url
-	try:
-		pattern = r'(?:https?:\/\/)?(?:[0-9A-Z-]+\.)?(?:youtube|youtu|youtube-nocookie)\.(?:com|be)\/(?:watch\?v=|watch\?.+&v=|embed\/|v\/|.+\?v=)?([^&=\n%\?]{11})'
-		video_id = re.findall(pattern, url, re.MULTILINE | re.IGNORECASE)
-		params = {"format": "json", "url": "https://www.youtube.com/watch?v=%s" % video_id[0]}
-		url = "https://www.youtube.com/oembed"
-		query_string = urlencode(params)
-		url = url + "?" + query_string
+	if url in Storage.audio_cache:
+		return Storage.audio_cache[url].title
+	return Storage.video_titles.get(url)
 
-		with urlopen(url) as response:
-			response_text = response.read()
-			data = json.loads(response_text.decode())
+async def get_video_title(url: str) -> str:
+	if (title := get_cached_video_title(url)):
+		return title
+	url = prepare_url(url)
+
+	try:
+		params = {"format": "json", "url": "https://www.youtube.com/watch?v=%s" % get_youtube_video_id(url)}
+		async with title_requests_semaphore:
+			async with HttpClient.get_session().get("https://www.youtube.com/oembed", params=params) as response:
+				response.raise_for_status()
+				data = await response.json(content_type=None)
 
+		Storage.video_titles[url] = data['title']
 		return data['title']
 	except:
 		return translate(LocaleKeys.Info.cant_get_title)
@@ -0,0 +1,84 @@
+import os
+import json
+import time
+import asyncio
+from pathlib import Path
+from typing import Dict, List
+from metrics import Metrics
+
+
+class GuildStore:
+	def __init__(self, directory: Path, flush_delay: float=2) -> None:
+		self._directory = directory
+		self._flush_delay = flush_delay
+		self._pending: Dict[int, dict | None] = {}
+		self._flush_task: asyncio.Task = None
+
+	def _get_path(self, guild_id: int) -> Path:
+		return self._directory / f'{guild_id}.json'
+
+	def load(self) -> Dict[int, dict]:
+		os.makedirs(self._directory, exist_ok=True)
+		guilds_data = {}
+
+		for entry in os.scandir(self._directory):
+			if entry.name.endswith('.tmp'):
+				os.remove(entry.path)
+				continue
+			try:
+				with open(entry.path, 'r', encoding='utf-8') as file:
+					guilds_data[int(entry.name.removesuffix('.json'))] = json.load(file)
+			except (OSError, ValueError) as e:
+				print(f'Error loading guild data from file {entry.path}: {e}')
+
+		return guilds_data
+
+	def update(self, guild_id: int, data: dict | None) -> None:
+		self._pending[guild_id] = data
+		if not self._flush_task:
+			self._flush_task = asyncio.create_task(self._flush_worker())
+
+	def _take_pending(self) -> Dict[int, str | None]:
+		partitions = {
+			guild_id: json.dumps(data, indent=4, ensure_ascii=False) if data else None
+			for guild_id, data in self._pending.items()
+		}
+		self._pending.clear()
+		return partitions
+
+	def _write_partitions(self, partitions: Dict[int, str | None]) -> List[float]:
+		durations = []
+		for guild_id, content in partitions.items():
+			path = self._get_path(guild_id)
+			started = time.perf_counter()
+			try:
+				if content is None:
+					if path.exists():
+						os.remove(path)
+				else:
+					temp_path = path.with_name(f'{path.name}.tmp')
+					with open(temp_path, 'w', encoding='utf-8') as file:
+						file.write(content)
+					os.replace(temp_path, path)
+			except OSError as e:
+				print(f'Error saving guild data to file {path}: {e}')
+			durations.append(time.perf_counter() - started)
+		return durations
+
+	@staticmethod
+	def _observe_durations(durations: List[float]) -> None:
+		for duration in durations:
+			Metrics.persistence_write_seconds.observe(duration, 'guilds')
+
+	async def _flush_worker(self) -> None:
+		try:
+			while self._pending:
+				await asyncio.sleep(self._flush_delay)
+				durations = await asyncio.to_thread(self._write_partitions, self._take_pending())
+				self._observe_durations(durations)
+		finally:
+			self._flush_task = None
+
+	def flush(self) -> None:
+		os.makedirs(self._directory, exist_ok=True)
+		self._observe_durations(self._write_partitions(self._take_pending()))
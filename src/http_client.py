@@ -0,0 +1,17 @@
+import aiohttp
+
+
+class HttpClient:
+	_session: aiohttp.ClientSession = None
+
+	@classmethod
+	def get_session(cls) -> aiohttp.ClientSession:
+		if not cls._session or cls._session.closed:
+			cls._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10))
+		return cls._session
+
+	@classmethod
+	async def close(cls) -> None:
+		if cls._session:
+			await cls._session.close()
+			cls._session = None
@@ -0,0 +1,53 @@
+import os
+import sys
+import time
+import subprocess
+from typing import List
+from config import Config
+
+
+SHARD_IDS_ENV = 'BOT_SHARD_IDS'
+WORKER_RESTART_DELAY = 5
+
+def get_shard_count() -> int:
+	return max(Config.shard_count, Config.worker_processes)
+
+def get_worker_shard_ids() -> List[int] | None:
+	if (shard_ids := os.environ.get(SHARD_IDS_ENV)) is None:
+		return None
+	return [int(shard_id) for shard_id in shard_ids.split(',') if shard_id]
+
+def get_worker_index() -> int:
+	return shard_ids[0] if (shard_ids := get_worker_shard_ids()) else 0
+
+def is_sharded() -> bool:
+	return get_shard_count() > 1
+
+def is_launcher_process() -> bool:
+	return Config.worker_processes > 1 and get_worker_shard_ids() is None
+
+def start_worker(script_path: str, shard_ids: List[int]) -> subprocess.Popen:
+	env = {**os.environ, SHARD_IDS_ENV: ','.join(map(str, shard_ids))}
+	print(f'Starting worker for shards {shard_ids}')
+	return subprocess.Popen([sys.executable, script_path], env=env)
+
+def run_workers(script_path: str) -> None:
+	shard_count = get_shard_count()
+	workers_shard_ids = [
+		list(range(worker_index, shard_count, Config.worker_processes))
+		for worker_index in range(Config.worker_processes)
+	]
+	workers = [start_worker(script_path, shard_ids) for shard_ids in workers_shard_ids]
+
+	try:
+		while True:
+			time.sleep(WORKER_RESTART_DELAY)
+			for index, worker in enumerate(workers):
+				if worker.poll() is not None:
+					print(f'Worker for shards {workers_shard_ids[index]} exited with code {worker.returncode}')
+					workers[index] = start_worker(script_path, workers_shard_ids[index])
+	except KeyboardInterrupt:
+		for worker in workers:
+			worker.terminate()
+		for worker in workers:
+			worker.wait()
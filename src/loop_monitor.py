@@ -0,0 +1,87 @@
+import sys
+import time
+import asyncio
+import threading
+import traceback
+from collections import deque
+from typing import Deque, Tuple
+from metrics import Metrics
+
+
+class LoopMonitor:
+	_interval = .05
+	_max_lag_window = 60
+
+	_loop: asyncio.AbstractEventLoop = None
+	_loop_thread_id: int = None
+	_threshold: float = 0
+	_last_beat: float = 0
+	_reported_beat: float = 0
+	_lags: Deque[Tuple[float, float]] = deque()
+	_task: asyncio.Task = None
+
+	@classmethod
+	def start(cls, threshold: float) -> None:
+		if cls._task or threshold <= 0:
+			return
+
+		cls._loop = asyncio.get_running_loop()
+		cls._loop_thread_id = threading.get_ident()
+		cls._threshold = threshold
+		cls._last_beat = time.monotonic()
+		cls._task = asyncio.create_task(cls._heartbeat(), name='loop monitor')
+		Metrics.loop_max_lag.set_function(cls.get_max_lag)
+		threading.Thread(target=cls._watch, name='loop-watchdog', daemon=True).start()
+
+	@classmethod
+	def set_activity(cls, name: str) -> None:
+		if (task := asyncio.current_task()):
+			task.set_name(name)
+
+	@classmethod
+	def _drop_old_lags(cls, now: float) -> None:
+		while cls._lags and cls._lags[0][0] < now - cls._max_lag_window:
+			cls._lags.popleft()
+
+	@classmethod
+	def get_max_lag(cls) -> float:
+		cls._drop_old_lags(time.monotonic())
+		return cls._lags[0][1] if cls._lags else 0
+
+	@classmethod
+	async def _heartbeat(cls) -> None:
+		while True:
+			await asyncio.sleep(cls._interval)
+			now = time.monotonic()
+			lag = max(now - cls._last_beat - cls._interval, 0)
+			cls._last_beat = now
+			while cls._lags and cls._lags[-1][1] <= lag:
+				cls._lags.pop()
+			cls._lags.append((now, lag))
+			cls._drop_old_lags(now)
+			Metrics.loop_lag_seconds.observe(lag)
+
+	@classmethod
+	def _get_blocking_task_name(cls) -> str:
+		try:
+			task = asyncio.current_task(cls._loop)
+		except RuntimeError:
+			task = None
+		return task.get_name() if task else 'callback'
+
+	@classmethod
+	def _watch(cls) -> None:
+		while not cls._loop.is_closed():
+			time.sleep(cls._threshold / 4)
+
+			last_beat = cls._last_beat
+			blocked_for = time.monotonic() - last_beat - cls._interval
+			if last_beat == cls._reported_beat or blocked_for < cls._threshold:
+				continue
+			cls._reported_beat = last_beat
+
+			task_name = cls._get_blocking_task_name()
+			frame = sys._current_frames().get(cls._loop_thread_id)
+			stack = ''.join(traceback.format_stack(frame)) if frame else ''
+			cls._loop.call_soon_threadsafe(Metrics.loop_blocks.inc, task_name)
+			print(f'Event loop is blocked for {blocked_for:.2f} s by [{task_name}]:\n{stack}')
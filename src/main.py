@@ -4,10 +4,23 @@ from locale_provider import *
 Config.load_config()
 Locale.init(Config.locale)
 
+import sys
+import launcher
+
+if launcher.is_launcher_process():
+	launcher.run_workers(__file__)
+	sys.exit()
+
 import os
+import asyncio
 import discord
+from typing import Tuple
 from discord import Option
 from storage import Storage
+from file_cache import AudioFileCache
+from metrics import Metrics
+from http_client import HttpClient
+from loop_monitor import LoopMonitor
 from model import (
 	TrackFile,
 	Playlist, 
@@ -19,6 +32,7 @@ from functions import (
 	delete_message, 
 	get_music_client, 
 	get_video_title,
+	get_cached_video_title,
 	get_tracknames,
 	is_playlist_url,
 	prepare_url
@@ -32,7 +46,16 @@ from play import (
 )
 
 
-bot = discord.Bot(intents=discord.Intents.all())
+if launcher.is_sharded():
+	shard_ids = launcher.get_worker_shard_ids()
+	bot = discord.AutoShardedBot(
+		intents=discord.Intents.all(),
+		shard_count=launcher.get_shard_count(),
+		shard_ids=shard_ids,
+		auto_sync_commands=not shard_ids or 0 in shard_ids
+	)
+else:
+	bot = discord.Bot(intents=discord.Intents.all())
 guild_ids = Config.guild_ids
 
 is_bot_started = False
@@ -44,10 +67,17 @@ async def on_ready() -> None:
 	if is_bot_started:
 		return
 	is_bot_started = True
+	LoopMonitor.start(Config.loop_block_threshold)
 
-	await Storage.load_urls()
+	await Storage.load_guild_data(bot)
 	await Storage.load_audio_cache()
-	await Storage.load_dj_channels(bot)
+	await Storage.load_video_titles()
+	await Storage.load_search_cache()
+	AudioFileCache.load()
+
+	if Config.metrics_port:
+		Storage.register_metrics()
+		await Metrics.start(Config.metrics_host, Config.metrics_port + launcher.get_worker_index())
 
 	print('Bot started')
 
@@ -55,6 +85,8 @@ async def on_ready() -> None:
 @bot.event
 async def on_message(message: discord.Message) -> None:
 	if message.author == bot.user:
+		if message.guild and message.guild.id in Storage.music_clients:
+			Storage.music_clients[message.guild.id].message_player.on_message(message)
 		return
 	if message.channel in Storage.dj_channels.values():
 		await delete_message(message)
@@ -75,6 +107,11 @@ async def on_voice_state_update(
 		await music_client.leave_the_channel_with_timeout(bot_member)
 
 
+@bot.before_invoke
+async def before_invoke(ctx: discord.ApplicationContext) -> None:
+	LoopMonitor.set_activity(f'command: {ctx.command.qualified_name}')
+
+
 @bot.event
 async def on_application_command_error(ctx: discord.ApplicationContext, error) -> None:
 	print(f'Error executing command {ctx.command.qualified_name}: {error}')
@@ -105,7 +142,7 @@ async def set_dj_channel(
 		ephemeral=True,
 		delete_after=30
 	)
-	await Storage.save_dj_channels()
+	Storage.save_guild_data(ctx.guild.id)
 
 @bot.slash_command(
 	name='remove_dj_channel', 
@@ -117,7 +154,7 @@ async def remove_dj_channel(
 	) -> None:
 	if ctx.guild.id in Storage.dj_channels:
 		channel = Storage.dj_channels.pop(ctx.guild.id)
-		await Storage.save_dj_channels()
+		Storage.save_guild_data(ctx.guild.id)
 		return await ctx.respond(translate(LocaleKeys.Info.dj_channel_uninstalled, ctx.author.mention, channel.mention), ephemeral=True, delete_after=15)
 
 @bot.slash_command(name='play', description=translate(LocaleKeys.Cmd.Play.desc), guild_ids=guild_ids)
@@ -162,6 +199,7 @@ async def _clear_music_cache(
 				return await ctx.respond(embed=discord.Embed(description=translate(LocaleKeys.Info.track_with_name_not_found, ctx.author.mention), colour=discord.Color.red()), delete_after=15)
 			url_or_name = saved_urls[url_or_name]
 		
+		url_or_name = prepare_url(url_or_name)
 		if url_or_name not in Storage.audio_cache:
 			return await ctx.respond(embed=discord.Embed(description=translate(LocaleKeys.Info.url_not_in_cache, ctx.author.mention, url_or_name), colour=discord.Color.red()), delete_after=15)
 		
@@ -169,10 +207,10 @@ async def _clear_music_cache(
 		await ctx.respond(embed=discord.Embed(description=translate(LocaleKeys.Info.url_removed_from_cache, ctx.author.mention, url_or_name), colour=discord.Color.from_rgb(255, 255, 255)), delete_after=15)
 	
 	else:
-		Storage.audio_cache = {}
+		Storage.audio_cache.clear()
+		Storage.search_cache.clear()
 		await ctx.respond(embed=discord.Embed(description=translate(LocaleKeys.Info.cache_cleared, ctx.author.mention), colour=discord.Color.from_rgb(255, 255, 255)), delete_after=15)
 	os.system('yt-dlp --rm-cache-dir')
-	await Storage.save_audio_cache()
 
 @bot.slash_command(name='play_save', description=translate(LocaleKeys.Cmd.PlaySave.desc), guild_ids=guild_ids)
 async def _add_track(
@@ -210,8 +248,7 @@ async def _add_track(
 	else:
 		await dj_channel.send(embed=discord.Embed(description=translate(LocaleKeys.Info.user_adds_track_name, ctx.author.mention, name, play_object.title, url), colour=discord.Color.orange()))
 		
-	saved_urls[name] = url
-	await Storage.save_urls()
+	Storage.add_saved_url(ctx, name, url)
 
 @bot.slash_command(name='next', description=translate(LocaleKeys.Cmd.Next.desc), guild_ids=guild_ids)
 async def _next(ctx: discord.ApplicationContext):
@@ -242,8 +279,7 @@ async def _remove_track(ctx: discord.ApplicationContext, name: Option(str, trans
 	if name not in saved_urls:
 		return await ctx.send(embed=discord.Embed(description=translate(LocaleKeys.Info.track_with_name_not_found, ctx.author.mention), colour=discord.Color.red()), delete_after=5)
 
-	saved_urls.pop(name)
-	await Storage.save_urls()
+	Storage.remove_saved_url(ctx, name)
 	await ctx.send(embed=discord.Embed(description=translate(LocaleKeys.Info.saved_url_removed, ctx.author.name, name), colour=discord.Color.green()))
 	
 
@@ -254,7 +290,7 @@ async def _get_names(ctx: discord.ApplicationContext, url_or_name: Option(str, t
 	if url_or_name in saved_urls:
 		url_or_name = saved_urls[url_or_name]
 	
-	names = [name for name in saved_urls if saved_urls[name] == url_or_name]
+	names = Storage.get_names_for_url(ctx, url_or_name)
 	
 	if not names:
 		return await ctx.respond(embed=discord.Embed(description=translate(LocaleKeys.Info.no_names_for_url, ctx.author.mention), colour=discord.Color.red()), delete_after=5)
@@ -262,8 +298,7 @@ async def _get_names(ctx: discord.ApplicationContext, url_or_name: Option(str, t
 
 @bot.slash_command(name='tracklist', description=translate(LocaleKeys.Cmd.Tracklist.desc), guild_ids=guild_ids)
 async def _tracklist(ctx: discord.ApplicationContext):
-	saved_urls = Storage.get_guild_saved_urls(ctx)
-	links = {link for link in saved_urls.values()}
+	links = list(Storage.get_guild_url_names(ctx))
 
 	if not links:
 		return await ctx.respond(translate(LocaleKeys.Info.saved_tracks_not_found, ctx.author.mention), ephemeral=True, delete_after=15)
@@ -280,9 +315,9 @@ async def _tracklist(ctx: discord.ApplicationContext):
 		s += ' '
 	msg += translate(LocaleKeys.Label.tracklist_name_column, s)
 
-	for url in links:
-		names = [key for key in saved_urls if saved_urls[key] == url]
-		title = get_video_title(url)
+	async def add_row(url: str, title: str) -> None:
+		nonlocal msg
+		names = Storage.get_names_for_url(ctx, url)
 		while len(title) < maxlen:
 			title += ' '
 		msg += f'{title}| {", ".join(names)}\n'
@@ -291,6 +326,19 @@ async def _tracklist(ctx: discord.ApplicationContext):
 			msg += '```'
 			await ctx.send(msg, delete_after=120)
 			msg = '```\n'
+
+	uncached_links = []
+	for url in links:
+		if not (title := get_cached_video_title(url)):
+			uncached_links.append(url)
+			continue
+		await add_row(url, title)
+
+	async def load_title(url: str) -> Tuple[str, str]:
+		return url, await get_video_title(url)
+
+	for title_task in asyncio.as_completed([load_title(url) for url in uncached_links]):
+		await add_row(*await title_task)
 	
 	msg += '```'
 
@@ -302,5 +350,15 @@ async def check_dj_channel(ctx: discord.ApplicationContext) -> bool:
 		return False
 	return True
 
+close_bot = bot.close
+
+async def close() -> None:
+	await HttpClient.close()
+	await Metrics.stop()
+	await close_bot()
+
+bot.close = close
+
 
-bot.run(Config.token)
\ No newline at end of file
+bot.run(Config.token)
+Storage.guild_store.flush()
\ No newline at end of file
@@ -0,0 +1,184 @@
+import time
+from aiohttp import web
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Tuple
+
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, 120)
+
+class Metric:
+	type = 'untyped'
+
+	def __init__(self, name: str, description: str, label_names: Tuple[str, ...]=()) -> None:
+		self.name = name
+		self.description = description
+		self.label_names = label_names
+
+	def _format_labels(self, label_values: Tuple[str, ...], extra: Tuple[Tuple[str, str], ...]=()) -> str:
+		labels = (*zip(self.label_names, label_values), *extra)
+		if not labels:
+			return ''
+		escaped = (
+			(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+			for name, value in labels
+		)
+		return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+	def _get_samples(self) -> Iterator[str]:
+		return iter(())
+
+	def render(self) -> List[str]:
+		return [
+			f'# HELP {self.name} {self.description}',
+			f'# TYPE {self.name} {self.type}',
+			*self._get_samples()
+		]
+
+class Counter(Metric):
+	type = 'counter'
+
+	def __init__(self, name: str, description: str, label_names: Tuple[str, ...]=()) -> None:
+		super().__init__(name, description, label_names)
+		self._values: Dict[Tuple[str, ...], float] = {}
+
+	def inc(self, *label_values: str, amount: float=1) -> None:
+		self._values[label_values] = self._values.get(label_values, 0) + amount
+
+	def _get_samples(self) -> Iterator[str]:
+		for label_values, value in self._values.items():
+			yield f'{self.name}{self._format_labels(label_values)} {value}'
+
+class Gauge(Metric):
+	type = 'gauge'
+
+	def __init__(self, name: str, description: str) -> None:
+		super().__init__(name, description)
+		self._function: Callable[[], float] = None
+
+	def set_function(self, function: Callable[[], float]) -> None:
+		self._function = function
+
+	def _get_samples(self) -> Iterator[str]:
+		if self._function:
+			yield f'{self.name} {self._function()}'
+
+class Histogram(Metric):
+	type = 'histogram'
+
+	def __init__(
+		self,
+		name: str,
+		description: str,
+		label_names: Tuple[str, ...]=(),
+		buckets: Tuple[float, ...]=DEFAULT_BUCKETS
+		) -> None:
+		super().__init__(name, description, label_names)
+		self.buckets = buckets
+		self._bucket_counts: Dict[Tuple[str, ...], List[int]] = {}
+		self._sums: Dict[Tuple[str, ...], float] = {}
+
+	def observe(self, value: float, *label_values: str) -> None:
+		if label_values not in self._bucket_counts:
+			self._bucket_counts[label_values] = [0] * (len(self.buckets) + 1)
+			self._sums[label_values] = 0
+
+		bucket_counts = self._bucket_counts[label_values]
+		for index, bound in enumerate(self.buckets):
+			if value <= bound:
+				bucket_counts[index] += 1
+		bucket_counts[-1] += 1
+		self._sums[label_values] += value
+
+	@contextmanager
+	def time(self, *label_values: str) -> Iterator[None]:
+		started = time.perf_counter()
+		try:
+			yield
+		finally:
+			self.observe(time.perf_counter() - started, *label_values)
+
+	def _get_samples(self) -> Iterator[str]:
+		for label_values, bucket_counts in self._bucket_counts.items():
+			bounds = (*map(str, self.buckets), '+Inf')
+			for bound, count in zip(bounds, bucket_counts):
+				yield f'{self.name}_bucket{self._format_labels(label_values, (("le", bound), ))} {count}'
+			yield f'{self.name}_sum{self._format_labels(label_values)} {self._sums[label_values]}'
+			yield f'{self.name}_count{self._format_labels(label_values)} {bucket_counts[-1]}'
+
+class Metrics:
+	extraction_seconds = Histogram(
+		'bot_extraction_seconds',
+		'yt-dlp extraction latency by call site',
+		('call_site', )
+	)
+	audio_cache_requests = Counter(
+		'bot_audio_cache_requests_total',
+		'Audio cache lookups by result',
+		('result', )
+	)
+	search_cache_requests = Counter(
+		'bot_search_cache_requests_total',
+		'Search query cache lookups by result',
+		('result', )
+	)
+	audio_cache_entries = Gauge('bot_audio_cache_entries', 'Number of entries in the audio cache')
+	stream_refreshes = Counter(
+		'bot_stream_refreshes_total',
+		'Expired or dead stream urls extracted again',
+		('call_site', )
+	)
+	ffmpeg_spawn_seconds = Histogram('bot_ffmpeg_spawn_seconds', 'Time to create an ffmpeg audio source')
+	music_clients_active = Gauge('bot_music_clients_active', 'Number of music clients that are playing')
+	queue_tracks = Gauge('bot_queue_tracks', 'Total number of tracks in all queues')
+	queue_tracks_max = Gauge('bot_queue_tracks_max', 'Number of tracks in the longest queue')
+	persistence_write_seconds = Histogram(
+		'bot_persistence_write_seconds',
+		'Duration of writes to persistent storage',
+		('store', )
+	)
+	loop_lag_seconds = Histogram(
+		'bot_event_loop_lag_seconds',
+		'Delay of the event loop heartbeat',
+		buckets=(.001, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+	)
+	loop_max_lag = Gauge('bot_event_loop_max_lag_seconds', 'Largest event loop heartbeat delay over the last minute')
+	loop_blocks = Counter(
+		'bot_event_loop_blocks_total',
+		'Times the event loop was blocked longer than the threshold by a task',
+		('task', )
+	)
+
+	_runner: web.AppRunner = None
+
+	@classmethod
+	def get_metrics(cls) -> List[Metric]:
+		return [metric for metric in vars(cls).values() if isinstance(metric, Metric)]
+
+	@classmethod
+	def render(cls) -> str:
+		return '\n'.join(line for metric in cls.get_metrics() for line in metric.render()) + '\n'
+
+	@classmethod
+	async def _handle_metrics(cls, request: web.Request) -> web.Response:
+		return web.Response(
+			body=cls.render().encode('utf-8'),
+			headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+		)
+
+	@classmethod
+	async def start(cls, host: str, port: int) -> None:
+		if cls._runner or not port:
+			return
+
+		app = web.Application()
+		app.router.add_get('/metrics', cls._handle_metrics)
+		cls._runner = web.AppRunner(app, access_log=None)
+		await cls._runner.setup()
+		await web.TCPSite(cls._runner, host, port).start()
+		print(f'Metrics are available at http://{host}:{port}/metrics')
+
+	@classmethod
+	async def stop(cls) -> None:
+		if cls._runner:
+			await cls._runner.cleanup()
+			cls._runner = None
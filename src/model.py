@@ -1,9 +1,7 @@
 import discord
-import asyncio
-from threading import Thread
 from discord.ext.commands import Converter
-from copy import deepcopy
 from typing import List
+from weakref import WeakValueDictionary
 from config import Config
 from locale_provider import LocaleKeys, translate
 
@@ -17,11 +15,23 @@ YDL_OPTIONS = {
 	'ignoreerrors': True
 }
 
+YDL_FLAT_OPTIONS = {
+	**YDL_OPTIONS,
+	'extract_flat': 'in_playlist',
+	'compat_opts': ['no-youtube-unavailable-videos']
+}
+
+UNAVAILABLE_VIDEO_TITLES = ('[Private video]', '[Deleted video]')
+
 FFMPEG_OPTIONS = {
 	'before_options': '-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5', 
 	'options': '-vn'
 }
 
+FFMPEG_FILE_OPTIONS = {
+	'options': '-vn'
+}
+
 class PlayEmbedTypes:
 	VIDEO = translate(LocaleKeys.Label.track)
 	PLAYLIST = translate(LocaleKeys.Label.playlist)
@@ -45,21 +55,6 @@ class PlayMixArg(CustomBoolArgument):
 class PlayMixWithQueueArg(CustomBoolArgument):
 	choices = (translate(LocaleKeys.Label.mix_with_queue), )
 
-class LoadingThread(Thread):
-	def __init__(self, target, args=(), kwargs={}) -> None:
-		super().__init__(target=target, args=args, kwargs=kwargs)
-		self.result = None
-		self.wait_time = 0
-
-	def run(self) -> None:
-		self.result = self._target(*self._args, **self._kwargs)
-
-	async def join(self) -> None:
-		while not self.result and self.wait_time < 180:
-			await asyncio.sleep(.05)
-			self.wait_time += .05
-		return self.result
-
 class LightContext:
 	def __init__(
         self, 
@@ -86,31 +81,53 @@ class ErrorPlayArgument(str):
 		return False
 
 class PlayObject:
+	__slots__ = ('url', 'title')
+
 	def __init__(self, url: str, title: str):
 		self.url = url
 		self.title = title
 
 class TrackFile(PlayObject):
+	__slots__ = ('source', )
+
 	def __init__(self, url: str, title: str):
 		super().__init__(url, title)
 		self.source = url
 
 class Track(PlayObject):
-	def __init__(self, url: str, title: str, source: str=None):
+	__slots__ = ('source', 'codec', '__weakref__')
+	_instances: WeakValueDictionary = WeakValueDictionary()
+
+	def __init__(self, url: str, title: str, source: str=None, codec: str=None):
 		super().__init__(url, title)
 		self.source = source
+		self.codec = codec
+
+	@classmethod
+	def create(cls, url: str, title: str, source: str=None, codec: str=None) -> 'Track':
+		if not url:
+			return cls(url, title, source, codec)
+
+		if (track := cls._instances.get(url)) is None:
+			track = cls._instances[url] = cls(url, title, source, codec)
+		elif source:
+			track.source = source
+			track.codec = codec
+		return track
 
 	def get_dict(self) -> dict:
-		dict_to_save = self.__dict__.copy()
-		dict_to_save.pop('source')
-		return dict_to_save
+		return {'url': self.url, 'title': self.title}
 
 class Playlist(PlayObject):
+	__slots__ = ('entries', )
+
 	def __init__(self, url: str, title: str, entries: List[Track]=None):
 		super().__init__(url, title)
 		self.entries: List[Track] = entries or []
 
 	def get_dict(self) -> dict:
-		cache_item_dict = deepcopy(self.__dict__)
-		cache_item_dict['entries'] = [track.get_dict() for track in self.entries]
-		return cache_item_dict
\ No newline at end of file
+		return {
+			'url': self.url, 
+			'title': self.title, 
+			'entries': [track.get_dict() for track in self.entries]
+		}
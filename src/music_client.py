@@ -1,17 +1,24 @@
 import discord
 import asyncio
-from yt_dlp import YoutubeDL
-from urllib.request import urlopen
-from urllib.error import HTTPError
-from typing import List, Union
+from typing import Dict, Union
 from discord.ui import View, Button
+from config import Config
 from locale_provider import LocaleKeys, translate
+from music_queue import MusicQueue
+from stream_source import (
+	STREAM_EXPIRE_MARGIN, 
+	is_stream_expired, 
+	is_stream_url_alive
+)
+from extractor import Extractor
+from metrics import Metrics
+from file_cache import AudioFileCache
 from model import (
 	LightContext, 
 	Track, 
 	TrackFile, 
-	YDL_OPTIONS, 
-	FFMPEG_OPTIONS
+	FFMPEG_OPTIONS,
+	FFMPEG_FILE_OPTIONS
 )
 from model import (
 	Playlist, 
@@ -20,15 +27,19 @@ from model import (
 )
 
 
+PREFETCH_EXPIRE_MARGIN = 600
+MAX_UNRESOLVED_TRACKS = 10
+
 class MusicClient:
 	def __init__(self, channel: discord.TextChannel=None) -> None:
 		self.lock: asyncio.Lock = asyncio.Lock()
 		self.channel: discord.TextChannel = channel
 		self.voice_client: discord.VoiceClient = None
-		self.queue: List[Union[Track, TrackFile]] = []
-		self.track_index: int = 0
+		self.queue: MusicQueue = MusicQueue()
 		self.message_player: MessagePlayer = MessagePlayer(self)
+		self.__prefetch_tasks: Dict[int, asyncio.Task] = {}
 		self.__started: bool = False
+		self.__session: int = 0
 		self.__intends_to_leave: bool = False
 
 	@property
@@ -52,17 +63,17 @@ class MusicClient:
 	async def next(self, user: discord.Member) -> None:
 		if not self.__voice_channels_are_equal(user):
 			return
-		if self.track_index + 1 >= len(self.queue):
-			self.track_index = -1
+		if not self.queue.has_next:
+			self.queue.jump_to(0)
+		self.prefetch_next_sources()
 		self.voice_client.stop()
 		await self.channel.send(embed=discord.Embed(description=translate(LocaleKeys.Info.user_play_next, user.mention), colour=discord.Color.gold()), delete_after=60)
 
 	async def previous(self, user: discord.Member) -> None:
 		if not self.__voice_channels_are_equal(user):
 			return
-		self.track_index -= 2
-		if self.track_index < -1:
-			self.track_index = -1
+		self.queue.jump_to(self.queue.next_position - 2)
+		self.prefetch_next_sources()
 		self.voice_client.stop()
 		await self.channel.send(embed=discord.Embed(description=translate(LocaleKeys.Info.user_play_prev, user.mention), colour=discord.Color.gold()), delete_after=60)
 
@@ -79,45 +90,127 @@ class MusicClient:
 		await self.reset()
 		await self.channel.send(embed=discord.Embed(description=translate(LocaleKeys.Info.user_play_stop, user.mention), colour=discord.Color.red()))
 
-	async def _prepare_sound_source(self) -> str:
-		current_track = self.queue[self.track_index]
-		sound_source = None
+	async def _resolve_source(
+		self, 
+		track: Union[Track, TrackFile], 
+		margin: int=STREAM_EXPIRE_MARGIN, 
+		call_site: str='prepare_sound_source'
+		) -> str:
+		if isinstance(track, TrackFile) or await is_stream_url_alive(track.source, margin):
+			return track.source
+
+		if track.source:
+			Metrics.stream_refreshes.inc(call_site)
+		info = await Extractor.extract_info(track.url, call_site=call_site)
+		track.source = info['url']
+		track.codec = info.get('acodec')
+		if not track.title or track.title == track.url:
+			track.title = info.get('title') or track.title
+		return track.source
+
+	async def _prepare_sound_source(self, current_track: Union[Track, TrackFile]) -> str:
+		if (local_path := AudioFileCache.get_path(current_track)):
+			return local_path
+
+		if (prefetch_task := self.__prefetch_tasks.pop(id(current_track), None)):
+			await asyncio.wait((prefetch_task, ))
+
+		sound_source = await self._resolve_source(current_track)
+		AudioFileCache.register_play(current_track, sound_source)
+		return sound_source
 
-		try:
-			sound_source = current_track.source
-			urlopen(sound_source)
-		except (HTTPError, AttributeError):
-			if not isinstance(current_track, TrackFile):
-				with YoutubeDL(YDL_OPTIONS) as ydl:
-					sound_source = ydl.extract_info(current_track.url, download=False)['url']
-					current_track.source = sound_source
+	async def _create_audio_source(self, track: Union[Track, TrackFile], sound_source: str) -> discord.AudioSource:
+		is_stream = sound_source.startswith('http')
+		options = FFMPEG_OPTIONS if is_stream else FFMPEG_FILE_OPTIONS
 
-		return sound_source
+		if not Config.opus_passthrough:
+			return discord.FFmpegPCMAudio(source=sound_source, **options)
+		if is_stream and isinstance(track, Track) and track.codec == 'opus':
+			return discord.FFmpegOpusAudio(sound_source, codec='copy', **options)
+		if isinstance(track, Track) and track.codec:
+			return discord.FFmpegOpusAudio(sound_source, **options)
+		return await discord.FFmpegOpusAudio.from_probe(sound_source, **options)
+
+	async def _prefetch_source(self, track: Track) -> None:
+		try:
+			await self._resolve_source(track, PREFETCH_EXPIRE_MARGIN, 'prefetch')
+		except Exception as e:
+			print(f'Can\'t prefetch source for url [{track.url}]: {e!r}')
+
+	def prefetch_next_sources(self) -> None:
+		upcoming_tracks = self.queue.get_upcoming(Config.prefetch_count)
+		upcoming_ids = {id(track) for track in upcoming_tracks}
+
+		for track_id in list(self.__prefetch_tasks):
+			if track_id not in upcoming_ids:
+				self.__prefetch_tasks.pop(track_id).cancel()
+
+		for track in upcoming_tracks:
+			if isinstance(track, TrackFile) or id(track) in self.__prefetch_tasks or AudioFileCache.contains(track):
+				continue
+			if track.source and is_stream_expired(track.source, PREFETCH_EXPIRE_MARGIN) is False:
+				continue
+			self.__prefetch_tasks[id(track)] = asyncio.create_task(self._prefetch_source(track))
+
+	def cancel_prefetch(self) -> None:
+		for task in self.__prefetch_tasks.values():
+			task.cancel()
+		self.__prefetch_tasks.clear()
 
 	async def play_music(self, ctx: Union[discord.ApplicationContext, LightContext]):
 		if self.is_started:
 			return await self.message_player.update()
 
 		self.start()
+		session = self.__session
 		excepted = 0
+		unresolved = 0
+		loop = asyncio.get_running_loop()
 
-		while len(self.queue) > self.track_index and excepted < 3:
+		while session == self.__session and self.queue.current and excepted < 3 and unresolved < MAX_UNRESOLVED_TRACKS:
 			await self.message_player.update()
 			await discord.utils.get(ctx.guild.members, id=self.voice_client.client.user.id).edit(mute=False)
+			track_finished = asyncio.Event()
+			current_track = self.queue.current
 
 			try:
-				sound_source = await self._prepare_sound_source()
-				self.voice_client.play(discord.FFmpegPCMAudio(source=sound_source, **FFMPEG_OPTIONS))
+				sound_source = await self._prepare_sound_source(current_track)
+			except Exception as e:
+				print(f'Track source error [{current_track.url}]: {e!r}')
+				await self.channel.send(embed=discord.Embed(description=translate(LocaleKeys.Info.track_play_error), colour=discord.Color.red()), delete_after=10)
+				sound_source = None
+			if session != self.__session:
+				return
+			if not sound_source:
+				unresolved += 1
+				self.queue.advance()
+				continue
+			unresolved = 0
+
+			try:
+				with Metrics.ffmpeg_spawn_seconds.time():
+					audio_source = await self._create_audio_source(current_track, sound_source)
+				if session != self.__session:
+					return audio_source.cleanup()
+				self.voice_client.play(
+					audio_source,
+					after=lambda _, event=track_finished: loop.call_soon_threadsafe(event.set)
+				)
+				self.prefetch_next_sources()
+				excepted = 0
 			except Exception:
 				await self.channel.send(embed=discord.Embed(description=translate(LocaleKeys.Info.track_play_error), colour=discord.Color.red()), delete_after=10)
 				excepted += 1
 				self.voice_client.stop()
+				track_finished.set()
 
-			while self.is_playing_or_paused:
-				await asyncio.sleep(1)
-			self.track_index += 1
+			await track_finished.wait()
+			if session != self.__session:
+				return
+			self.queue.advance()
 		
-		await self.reset()
+		if session == self.__session:
+			await self.reset()
 
 	async def leave_the_channel_with_timeout(self, bot_member: discord.Member):
 		if self.__intends_to_leave:
@@ -134,20 +227,28 @@ class MusicClient:
 		self.__intends_to_leave = False
 
 	async def reset(self, *, force: bool=False) -> None:
+		self.__session += 1
+		self.cancel_prefetch()
 		if self.voice_client:
 			self.voice_client.stop()
 			await self.voice_client.disconnect(force=force)
 			
 		self.voice_client = None
-		self.queue = []
-		self.track_index = 0
+		self.queue.clear()
 		self.__started = False
 		await self.message_player.delete()
 
 class MessagePlayer:
+	update_delay: float = .5
+	max_messages_below: int = 5
+
 	def __init__(self, music_client: MusicClient):
 		self.music_client = music_client
 		self.__message: discord.Message = None
+		self.__view: MessagePlayerView = None
+		self.__messages_below: int = 0
+		self.__update_requested: bool = False
+		self.__update_task: asyncio.Task = None
 
 	@staticmethod
 	def get_track_link_title(track: Union[Track, Playlist, TrackFile]) -> str:
@@ -156,37 +257,62 @@ class MessagePlayer:
 		return f'[{track.title}]({track.url})'
 
 	async def update(self) -> None:
-		async with self.music_client.lock:
-			await self._update()
+		self.__update_requested = True
+		if self.__update_task and not self.__update_task.done():
+			return
+		self.__update_task = asyncio.create_task(self.__update_worker())
+
+	async def __update_worker(self) -> None:
+		while self.__update_requested:
+			await asyncio.sleep(self.update_delay)
+			self.__update_requested = False
+			async with self.music_client.lock:
+				await self._update()
+
+	def on_message(self, message: discord.Message) -> None:
+		if self.__message and message.channel == self.__message.channel and message.id != self.__message.id:
+			self.__messages_below += 1
 
 	async def delete(self) -> None:
+		if self.__update_task:
+			self.__update_task.cancel()
+			self.__update_task = None
+		await self._delete_message()
+
+	async def _delete_message(self) -> None:
 		try:
 			await self.__message.delete()
 		except:
 			pass
+		self.__message = None
 
 	async def _update(self):
-		if not any((self.music_client.voice_client, self.music_client.queue)):
-			return
-
 		queue = self.music_client.queue
-		track_index = self.music_client.track_index
+		if not queue.current:
+			return
 
-		await self.delete()
-		this_track_info = self.get_track_link_title(queue[track_index])
+		this_track_info = self.get_track_link_title(queue.current)
 		next_track_info = (
-			self.get_track_link_title(queue[track_index+1]) 
-			if track_index+1 < len(queue) else translate(LocaleKeys.Label.end_of_queue)
+			self.get_track_link_title(queue.next_track) 
+			if queue.has_next else translate(LocaleKeys.Label.end_of_queue)
 		)
-		
-		self.__message = await self.music_client.channel.send(
-			embed=discord.Embed(
-				description=translate(LocaleKeys.Label.music_player_info, this_track_info, next_track_info),
-				colour=discord.Color.from_rgb(0, 239, 255)
-				), 
-			view=MessagePlayerView(self.music_client)
+		embed = discord.Embed(
+			description=translate(LocaleKeys.Label.music_player_info, this_track_info, next_track_info),
+			colour=discord.Color.from_rgb(0, 239, 255)
 		)
 
+		if self.__message and self.__messages_below <= self.max_messages_below:
+			self.__view.update_pause_button()
+			try:
+				return await self.__message.edit(embed=embed, view=self.__view)
+			except discord.NotFound:
+				pass
+
+		await self._delete_message()
+		self.__view = MessagePlayerView(self.music_client)
+		self.__message = await self.music_client.channel.send(embed=embed, view=self.__view)
+		self.__messages_below = 0
+
 class MessagePlayerButton(Button):
 	def __init__(self, emoji: str) -> None:
 		super().__init__(emoji=emoji, custom_id=emoji, style=discord.ButtonStyle.blurple)
@@ -205,11 +331,14 @@ class MessagePlayerView(View):
 
 		super().__init__(*buttons, timeout=None)
 
+	def update_pause_button(self) -> None:
+		self.pause_button.emoji = '▶️' if self.music_client.is_paused else '⏸'
+
 	async def callback(self, interaction: discord.Interaction) -> None:
 		match interaction.custom_id:
 			case '▶️' | '⏸':
 				if await self.music_client.pause(interaction.user):
-					self.pause_button.emoji = '▶️' if self.music_client.is_paused else '⏸'
+					self.update_pause_button()
 					return await interaction.response.edit_message(view=self)
 			case '⏪':
 				await self.music_client.previous(interaction.user)
@@ -0,0 +1,137 @@
+import random
+from collections import deque
+from weakref import WeakSet
+from itertools import islice
+from typing import Deque, Iterable, List, Union
+from model import Track, TrackFile
+
+
+QueueItem = Union[Track, TrackFile]
+
+class QueueSegment:
+	def __init__(self, start: int) -> None:
+		self.start = start
+		self.stop = start
+
+	def on_insert(self, position: int, count: int, is_owner: bool) -> None:
+		if position < self.start or position == self.start and not is_owner:
+			self.start += count
+			self.stop += count
+		elif position < self.stop or position == self.stop and is_owner:
+			self.stop += count
+		elif is_owner:
+			self.stop = position + count
+
+class MusicQueue:
+	def __init__(self) -> None:
+		self._history: List[QueueItem] = []
+		self._upcoming: Deque[QueueItem] = deque()
+		self._jump_position: int | None = None
+		self._segments: WeakSet[QueueSegment] = WeakSet()
+
+	@property
+	def current(self) -> QueueItem | None:
+		return self._upcoming[0] if self._upcoming else None
+
+	@property
+	def next_track(self) -> QueueItem | None:
+		return self._upcoming[1] if len(self._upcoming) > 1 else None
+
+	@property
+	def has_next(self) -> bool:
+		return len(self._upcoming) > 1
+
+	@property
+	def position(self) -> int:
+		return len(self._history)
+
+	@property
+	def next_position(self) -> int:
+		return self.position + 1 if self._jump_position is None else self._jump_position
+
+	def __len__(self) -> int:
+		return len(self._history) + len(self._upcoming)
+
+	def get_tracks(self, start: int, count: int) -> List[QueueItem]:
+		start = max(start, 0)
+		history_length = len(self._history)
+		tracks = self._history[start:start + count] if start < history_length else []
+		upcoming_start = max(start - history_length, 0)
+		tracks += islice(self._upcoming, upcoming_start, upcoming_start + count - len(tracks))
+		return tracks
+
+	def get_upcoming(self, count: int) -> List[QueueItem]:
+		return self.get_tracks(self.next_position, count)
+
+	def add(self, tracks: Iterable[QueueItem]) -> None:
+		self._upcoming.extend(tracks)
+
+	def insert_next(self, tracks: Iterable[QueueItem]) -> None:
+		self.insert(self.position + 1, tracks)
+
+	def _get_insert_position(self, position: int) -> int:
+		return min(max(position, self.position + 1), len(self))
+
+	def create_segment(self, position: int) -> QueueSegment:
+		segment = QueueSegment(self._get_insert_position(position))
+		self._segments.add(segment)
+		return segment
+
+	def insert(self, position: int, tracks: Iterable[QueueItem], segment: QueueSegment=None) -> None:
+		tracks = list(tracks)
+		position = self._get_insert_position(position)
+		offset = position - self.position
+		self._upcoming.rotate(-offset)
+		self._upcoming.extendleft(reversed(tracks))
+		self._upcoming.rotate(offset)
+
+		for other_segment in self._segments:
+			other_segment.on_insert(position, len(tracks), other_segment is segment)
+
+	def shuffle(self, start: int, stop: int) -> None:
+		start = max(start, self.position + 1) - self.position
+		stop = min(stop, len(self)) - self.position
+		if stop - start < 2:
+			return
+
+		tracks = list(islice(self._upcoming, start, stop))
+		random.shuffle(tracks)
+		self._upcoming.rotate(-start)
+		for _ in range(stop - start):
+			self._upcoming.popleft()
+		self._upcoming.extendleft(reversed(tracks))
+		self._upcoming.rotate(start)
+
+	def mix_with_upcoming(self, tracks: Iterable[QueueItem]) -> None:
+		fixed_tracks = [self._upcoming.popleft() for _ in range(min(2, len(self._upcoming)))]
+		tail = list(self._upcoming)
+		tail += tracks
+		random.shuffle(tail)
+
+		self._upcoming.clear()
+		self._upcoming.extend(fixed_tracks)
+		self._upcoming.extend(tail)
+
+	def jump_to(self, position: int) -> None:
+		self._jump_position = max(position, 0)
+
+	def advance(self) -> None:
+		position = self.next_position
+		self._jump_position = None
+		self.seek(position)
+
+	def seek(self, position: int) -> None:
+		position = min(max(position, 0), len(self))
+
+		if len(self._history) > position:
+			self._upcoming.extendleft(reversed(self._history[position:]))
+			del self._history[position:]
+		while len(self._history) < position:
+			self._history.append(self._upcoming.popleft())
+
+	def clear(self) -> None:
+		self._history.clear()
+		self._upcoming.clear()
+		self._jump_position = None
+		for segment in self._segments:
+			segment.start = segment.stop = 0
@@ -0,0 +1,40 @@
+from bisect import bisect_left
+from typing import Iterable, List, Tuple
+
+
+class NamesIndex:
+	def __init__(self, names: Iterable[str]=(), ignore_case: bool=False) -> None:
+		self.ignore_case = ignore_case
+		self._entries: List[Tuple[str, str]] = sorted((self._get_key(name), name) for name in names)
+
+	def _get_key(self, name: str) -> str:
+		return name.casefold() if self.ignore_case else name
+
+	def add(self, name: str) -> None:
+		entry = (self._get_key(name), name)
+		index = bisect_left(self._entries, entry)
+		if index == len(self._entries) or self._entries[index] != entry:
+			self._entries.insert(index, entry)
+
+	def remove(self, name: str) -> None:
+		entry = (self._get_key(name), name)
+		index = bisect_left(self._entries, entry)
+		if index < len(self._entries) and self._entries[index] == entry:
+			del self._entries[index]
+
+	def find(self, prefix: str, limit: int=25) -> List[str]:
+		key = self._get_key(prefix)
+		index = bisect_left(self._entries, (key, ''))
+		names = []
+
+		while index < len(self._entries) and len(names) < limit:
+			entry_key, name = self._entries[index]
+			if not entry_key.startswith(key):
+				break
+			names.append(name)
+			index += 1
+
+		return names
+
+	def __len__(self) -> int:
+		return len(self._entries)
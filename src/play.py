@@ -1,10 +1,15 @@
 import discord
 import random
-from typing import Union, List
-from yt_dlp import YoutubeDL
+import asyncio
+from typing import Union, List, Tuple
+from config import Config
 from storage import Storage
+from extractor import Extractor
+from metrics import Metrics
 from music_client import MusicClient
+from music_queue import QueueSegment
 from views import ChoicePlayOptionView
+from url_parser import parse_url
 from locale_provider import LocaleKeys, translate
 from model import (
 	Track,
@@ -13,8 +18,8 @@ from model import (
 	LightContext,
 	AddTrackTypes,
 	PlayEmbedTypes,
-	YDL_OPTIONS,
-	LoadingThread
+	YDL_FLAT_OPTIONS,
+	UNAVAILABLE_VIDEO_TITLES
 )
 from functions import (
 	get_data_type,
@@ -25,7 +30,8 @@ from functions import (
 	delete_message,
 	ask_yes_no,
 	send_load_video_error,
-	prepare_request
+	prepare_request,
+	prepare_url
 )
 
 
@@ -45,20 +51,27 @@ async def add_tracks_to_queue(
 	insert: bool, 
 	mix_with_queue: bool
 	) -> None:
-	queue = music_client.queue
-	track_index = music_client.track_index
-	
 	if not isinstance(tracks, list):
 		tracks = [tracks]
 	
 	if mix_with_queue:
-		updated_queue = queue[track_index+2:] + tracks
-		random.shuffle(updated_queue)
-		music_client.queue = queue[:track_index+2] + updated_queue
+		music_client.queue.mix_with_upcoming(tracks)
 	elif insert:
-		music_client.queue = queue[:track_index+1] + tracks + queue[track_index+1:]
+		music_client.queue.insert_next(tracks)
 	else:
-		music_client.queue += tracks
+		music_client.queue.add(tracks)
+
+	await update_queue_view(music_client)
+
+async def update_queue_view(music_client: MusicClient) -> None:
+	if music_client.is_started:
+		music_client.prefetch_next_sources()
+		await music_client.message_player.update()
+
+def is_available_entry(video: dict | None) -> bool:
+	if not video or not video.get('url'):
+		return False
+	return video.get('_type') != 'url' or video.get('title') not in UNAVAILABLE_VIDEO_TITLES
 
 def create_play_object(yt_dlp_data: dict) -> Union[Track, Playlist]:
 	if not yt_dlp_data:
@@ -67,52 +80,73 @@ def create_play_object(yt_dlp_data: dict) -> Union[Track, Playlist]:
 	is_playlist = yt_dlp_data.get('_type') == 'playlist'
 
 	if not is_playlist:
-		return Track(
-			url=yt_dlp_data.get('original_url'),
+		return Track.create(
+			url=prepare_url(yt_dlp_data.get('original_url')),
 			title=yt_dlp_data.get('title'),
-			source=yt_dlp_data.get('url')
+			source=yt_dlp_data.get('url'),
+			codec=yt_dlp_data.get('acodec')
 		)
 
 	entries = yt_dlp_data.get('entries')
 	while entries[0] and 'entries' in entries[0].keys():
 		entries = entries[0].get('entries')
 
-	if len(entries) == 0:
-		raise ValueError(f'No play source by url')
-
 	playlist_entries = [
-		Track(
-			url=video.get('original_url'), 
+		Track.create(
+			url=prepare_url(video.get('url')), 
+			title=video.get('title') or video.get('url')
+		) 
+		if video.get('_type') == 'url' else
+		Track.create(
+			url=prepare_url(video.get('original_url')), 
 			title=video.get('title'),
-			source=video.get('url')
+			source=video.get('url'),
+			codec=video.get('acodec')
 		) 
-		for video in entries if video
+		for video in entries if is_available_entry(video)
 	]
 
+	if len(playlist_entries) == 0:
+		raise ValueError(f'No play source by url')
+
 	return Playlist(
-		url=yt_dlp_data.get('original_url'),
+		url=prepare_url(yt_dlp_data.get('original_url')),
 		title=yt_dlp_data.get('title'),
 		entries=playlist_entries
 	)
 
-def create_play_object_wrapper(url: str) -> Union[Track, Playlist] | None:
-	with YoutubeDL(YDL_OPTIONS) as ydl:
-		try:
-			return create_play_object(ydl.extract_info(url, download=False))
-		except Exception as e:
-			print(f'Can\'t get data for url [{url}]: {e}')
+def get_nested_playlist_url(yt_dlp_data: dict) -> str | None:
+	if yt_dlp_data.get('_type') != 'playlist' or not (entries := yt_dlp_data.get('entries')):
+		return None
+	if entries[0] and entries[0].get('_type') == 'url' and (url := entries[0].get('url')) and parse_url(url).is_playlist:
+		return url
+
+async def extract_play_data(url: str) -> dict | None:
+	yt_dlp_data = await Extractor.extract_info(url, YDL_FLAT_OPTIONS, call_site='get_play_object_by_url')
+
+	if yt_dlp_data and (nested_url := get_nested_playlist_url(yt_dlp_data)):
+		nested_data = await Extractor.extract_info(nested_url, YDL_FLAT_OPTIONS, call_site='get_play_object_by_url')
+		yt_dlp_data['entries'] = nested_data.get('entries') if nested_data else []
+	return yt_dlp_data
+
+async def load_play_object(url: str) -> Union[Track, Playlist] | None:
+	try:
+		return create_play_object(await extract_play_data(url))
+	except Exception as e:
+		print(f'Can\'t get data for url [{url}]: {e!r}')
 
 async def get_play_object_by_url(url: str) -> Union[Track, Playlist] | None:
+	url = prepare_url(url)
 	if url not in Storage.audio_cache:
-		t = LoadingThread(target=create_play_object_wrapper, args=(url,))
-		t.start()
-		play_object = await t.join()
+		Metrics.audio_cache_requests.inc('miss')
+		play_object = await load_play_object(url)
 
 		if not play_object:
 			return
 
 		Storage.audio_cache[url] = play_object
-		await Storage.save_audio_cache()
+	else:
+		Metrics.audio_cache_requests.inc('hit')
 	
 	return Storage.audio_cache[url]
 
@@ -159,12 +193,12 @@ async def play_from_message(message: discord.Message):
 	mc = get_music_client(ctx.guild)
 
 	if audio_files or message.content.startswith('http') or message.content in Storage.get_guild_saved_urls(ctx) or call_play_list:
-		if call_play_list or is_playlist_url(parse_video_url(ctx, message.content)):
+		if call_play_list or is_playlist_url(await parse_video_url(ctx, message.content)):
 			mix = await ask_to_mix_request(message)
 	elif not await ask_to_find_video(message):
 		return
 
-	if mc.is_playing_or_paused and mc.track_index < len(mc.queue)-1:
+	if mc.is_playing_or_paused and mc.queue.has_next:
 		request = await prepare_request(ctx, message.content, audio_files)
 		play_option = await choice_play_option(message, request)
 		if play_option == AddTrackTypes.CANCEL:
@@ -198,6 +232,24 @@ async def play_from_file(
 
 	await mc.play_music(ctx)
 
+async def resolve_play_list_arg(
+	ctx: Union[discord.ApplicationContext, LightContext], 
+	index: int, 
+	url_or_name: str, 
+	semaphore: asyncio.Semaphore
+	) -> Tuple[int, Union[Track, Playlist] | None]:
+	async with semaphore:
+		if not (url := await parse_video_url(ctx, url_or_name)):
+			return index, None
+		return index, await get_play_object_by_url(url)
+
+def get_play_list_entry(play_object: Union[Track, Playlist, TrackFile]) -> Tuple[str, List[Union[Track, TrackFile]]]:
+	if isinstance(play_object, TrackFile):
+		return f'{play_object.title} *({translate(LocaleKeys.Label.file).title()})*', [play_object]
+	if isinstance(play_object, Playlist):
+		return f'[{play_object.title}]({play_object.url}) *({translate(LocaleKeys.Label.playlist).title()})*', list(play_object.entries)
+	return f'[{play_object.title}]({play_object.url})', [play_object]
+
 async def play_list(
 	ctx: Union[discord.ApplicationContext, LightContext], 
 	urls_or_names: str, 
@@ -206,46 +258,99 @@ async def play_list(
 	mix: bool, 
 	mix_with_queue: bool
 	) -> None:
-	args = [parse_video_url(ctx, x.strip()) for x in urls_or_names.split(',') if x]
-	args_without_empty = [arg for arg in args if arg]
+	args = [x.strip() for x in urls_or_names.split(',') if x and not x.isspace()]
 	
-	if len(args_without_empty) == 1 and not files:
-		return await play(ctx, args_without_empty[0], insert, mix, mix_with_queue)
-	if len(files) == 1 and not args_without_empty:
+	if len(args) == 1 and not files:
+		return await play(ctx, args[0], insert, mix, mix_with_queue)
+	if len(files) == 1 and not args:
 		return await play_from_file(ctx, files[0], insert, mix_with_queue)
 
 	mc = get_music_client(ctx.guild)
 	dj_channel = Storage.dj_channels[ctx.guild.id]
 
 	quick_start = f'\n\n{translate(LocaleKeys.Label.quick_play)}: {urls_or_names}' if urls_or_names else ''
-	message_text, _ = await get_embed_data(mc, insert, mix_with_queue, PlayEmbedTypes.PLAY_LIST)
+	message_text, embed_color = await get_embed_data(mc, insert, mix_with_queue, PlayEmbedTypes.PLAY_LIST)
 	play_list_message = await dj_channel.send(embed=discord.Embed(description=f'{ctx.author.mention} {message_text}\n\n*({translate(LocaleKeys.Label.names_and_tracks_loading)})*{quick_start}', colour=discord.Color.default()))
 
 	entries_count = len(args) + len(files)
+	play_objects: List[Union[Track, Playlist, TrackFile, None]] = [None] * len(args) + files
+	is_resolved = [False] * len(args) + [True] * len(files)
+	is_enqueued = [False] * entries_count
+	next_index = 0
 	track_titles = []
-	temp_queue: List[Union[Track, TrackFile]] = []
-	error_args = []
+	segment: QueueSegment = None
+	playback: asyncio.Task = None
 	nl = '\n'
-	
-	for i, url in enumerate(args, 1):
-		play_object = await get_play_object_by_url(url)
-		if not play_object:
-			error_args.append(url)
-			continue
 
-		playlist_mark = '' if not isinstance(play_object, Playlist) else f' *({translate(LocaleKeys.Label.playlist).title()})*'
-		track_titles.append(f'[{play_object.title}]({play_object.url}){playlist_mark}')
-		if isinstance(play_object, Playlist):
-			temp_queue += play_object.entries
-		else:
-			temp_queue.append(play_object)
+	def get_titles_text() -> str:
+		if len(''.join(track_titles)) > 1700:
+			return nl.join(track_titles[:10] + ['...'])
+		return nl.join(track_titles)
+
+	async def enqueue(index: int) -> None:
+		nonlocal segment
+		is_enqueued[index] = True
+		title, tracks = get_play_list_entry(play_objects[index])
+		track_titles.append(title)
+		if mix_with_queue:
+			return await add_tracks_to_queue(mc, tracks, insert, mix_with_queue)
+
+		# tracks of this request stay together in one segment of the queue; on mix the new tracks are shuffled
+		# into the part of the segment behind the prefetched tracks, so their sources are not fetched again
+		if not segment:
+			segment = mc.queue.create_segment(mc.queue.position + 1 if insert else len(mc.queue))
+		mc.queue.insert(segment.stop, tracks, segment)
+		if mix:
+			mc.queue.shuffle(max(segment.start, mc.queue.next_position + Config.prefetch_count), segment.stop)
+		await update_queue_view(mc)
+
+	async def enqueue_ready() -> None:
+		nonlocal next_index
+		while next_index < entries_count and is_resolved[next_index]:
+			if play_objects[next_index] and not is_enqueued[next_index]:
+				await enqueue(next_index)
+			next_index += 1
+
+	async def start_playback() -> bool:
+		nonlocal playback
+		if not mc.queue.current or (playback and (mc.is_started or not playback.done())):
+			return True
+		if playback:
+			await playback
+		if not mc.voice_client and not await try_connect(ctx):
+			return False
+		playback = asyncio.create_task(mc.play_music(ctx))
+		return True
 
-		await play_list_message.edit(embed=discord.Embed(description=f'{ctx.author.mention} {message_text}\n\n*({translate(LocaleKeys.Label.names_and_tracks_loading)})* **[{i}/{entries_count}]**{quick_start}', colour=discord.Color.default()))
-	
-	for i, file in enumerate(files, 1):
-		track_titles.append(f'{file.title} *({translate(LocaleKeys.Label.file).title()})*')
-		temp_queue.append(file)
-		await play_list_message.edit(embed=discord.Embed(description=f'{ctx.author.mention} {message_text}\n\n*({translate(LocaleKeys.Label.names_and_tracks_loading)})* **[{i+len(args)}/{entries_count}]**{quick_start}', colour=discord.Color.default()))
+	semaphore = asyncio.Semaphore(Config.play_list_concurrency)
+	resolve_tasks = [
+		asyncio.create_task(resolve_play_list_arg(ctx, index, url_or_name, semaphore)) 
+		for index, url_or_name in enumerate(args)
+	]
+
+	try:
+		await enqueue_ready()
+		if not await start_playback():
+			return await delete_message(play_list_message)
+
+		for i, resolve_task in enumerate(asyncio.as_completed(resolve_tasks), 1):
+			index, play_objects[index] = await resolve_task
+			is_resolved[index] = True
+
+			# an idle player starts with whatever is resolved first, the rest keeps the requested order
+			if play_objects[index] and not mc.is_started and not mc.queue.current:
+				await enqueue(index)
+			await enqueue_ready()
+			if not await start_playback():
+				return await delete_message(play_list_message)
+
+			titles = f'\n\n**{get_titles_text()}**' if track_titles else ''
+			await play_list_message.edit(embed=discord.Embed(description=f'{ctx.author.mention} {message_text}\n\n*({translate(LocaleKeys.Label.names_and_tracks_loading)})* **[{i+len(files)}/{entries_count}]**{titles}{quick_start}', colour=discord.Color.default()))
+	finally:
+		for resolve_task in resolve_tasks:
+			resolve_task.cancel()
+
+	error_args = [arg for arg, play_object in zip(args, play_objects) if not play_object]
 
 	if len(error_args) > 0:
 		await ctx.send(embed=discord.Embed(description=translate(LocaleKeys.Info.cant_get_data_for_list, ctx.author.mention, nl.join(error_args)), colour=discord.Color.red()), delete_after=60)
@@ -253,22 +358,10 @@ async def play_list(
 		await ctx.send(embed=discord.Embed(description=translate(LocaleKeys.Info.cant_get_data_for_everyone, ctx.author.mention), colour=discord.Color.red()), delete_after=10)
 		return await play_list_message.delete()
 
-	if mix:
-		random.shuffle(temp_queue)
-	await add_tracks_to_queue(mc, temp_queue, insert, mix_with_queue)
-
-	lendth = len(''.join(track_titles))
-	if lendth > 1700:
-		track_titles = track_titles[:10]
-		track_titles.append('...')
-
-	if not mc.voice_client and not await try_connect(ctx):
-		return await delete_message(play_list_message)
-
-	message_text, embed_color = await get_embed_data(mc, insert, mix_with_queue, PlayEmbedTypes.PLAY_LIST)
-	await play_list_message.edit(embed=discord.Embed(description=f'{ctx.author.mention} {message_text}\n\n**{nl.join(track_titles)}**{quick_start}', colour=embed_color))
+	await play_list_message.edit(embed=discord.Embed(description=f'{ctx.author.mention} {message_text}\n\n**{get_titles_text()}**{quick_start}', colour=embed_color))
 	
-	await mc.play_music(ctx)
+	if playback:
+		await playback
 
 async def play(
 	ctx: Union[discord.ApplicationContext, LightContext], 
@@ -281,9 +374,9 @@ async def play(
 	dj_channel = Storage.dj_channels[ctx.guild.id]
 
 	if len([x for x in url_or_name.split(',') if x]) > 1:
-		return await play_list(ctx, url_or_name, insert, mix, mix_with_queue)
+		return await play_list(ctx, url_or_name, [], insert, mix, mix_with_queue)
 
-	track_url = parse_video_url(ctx, url_or_name)
+	track_url = await parse_video_url(ctx, url_or_name)
 	if not track_url:
 		return await send_load_video_error(ctx, url_or_name)
 
@@ -291,10 +384,18 @@ async def play(
 	message_text, _ = await get_embed_data(mc, insert, mix_with_queue, get_data_type(is_playlist))
 	play_message = await dj_channel.send(embed=discord.Embed(description=f'{ctx.author.mention} {message_text}\n\n*({translate(LocaleKeys.Label.loading_take_some_time)})*', colour=discord.Color.default()))
 	
+	connect_task = asyncio.create_task(try_connect(ctx)) if not mc.voice_client else None
 	play_object = await get_play_object_by_url(track_url)
 	if not play_object:
+		if connect_task and await connect_task and not mc.is_started and not mc.queue.current:
+			await mc.reset()
 		return await send_load_video_error(ctx, track_url, loading_message=play_message)
 
+	if connect_task and not await connect_task:
+		return await delete_message(play_message)
+	if not mc.voice_client and not await try_connect(ctx):
+		return await delete_message(play_message)
+
 	if isinstance(play_object, Playlist):
 		playlist_videos = list(play_object.entries)
 		if mix:
@@ -304,13 +405,9 @@ async def play(
 		await add_tracks_to_queue(mc, play_object, insert, mix_with_queue)
 
 	message_text, embed_color = await get_embed_data(mc, insert, mix_with_queue, get_data_type(isinstance(play_object, Playlist)))
-	saved_urls = Storage.get_guild_saved_urls(ctx)
-	quick_start_names = [name for name in saved_urls if saved_urls[name] == play_object.url]
+	quick_start_names = Storage.get_names_for_url(ctx, play_object.url)
 	quick_start = '' if not quick_start_names else f'\n\n{translate(LocaleKeys.Label.quick_play)}: {" / ".join(quick_start_names)}'
 	data_title = f'[{play_object.title}]({play_object.url})'
 	await play_message.edit(embed=discord.Embed(description=f'{ctx.author.mention} {message_text}\n\n**{data_title}**{quick_start}', colour=embed_color))
 
-	if not mc.voice_client and not await try_connect(ctx):
-		return await delete_message(play_message)
-
 	await mc.play_music(ctx)
\ No newline at end of file
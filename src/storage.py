@@ -2,30 +2,45 @@ import json
 import os
 import discord
 from pathlib import Path
-from typing import Union, Dict
+from typing import Union, Dict, List, Set
 from music_client import MusicClient
-from model import (
-	LightContext, 
-	Playlist, 
-	Track
-)
+from config import Config
+from metrics import Metrics
+from cache_store import CacheStore, AudioCache, SearchCache
+from guild_store import GuildStore
+from names_index import NamesIndex
+from model import LightContext
 
 
 class Storage:
 	__base_path = Path(__file__).resolve().parent 
-	_saved_urls_path = __base_path.parent / 'data/saved_urls.json'
-	_audio_cache_path = __base_path.parent / 'data/audio_cache.json'
-	_dj_channels_path = __base_path.parent / 'data/dj_channels.json'
+	_data_path = __base_path.parent / 'data'
+	_guilds_path = __base_path.parent / 'data/guilds'
+	_legacy_saved_urls_path = __base_path.parent / 'data/saved_urls.json'
+	_audio_cache_path = __base_path.parent / 'data/audio_cache.db'
+	_legacy_audio_cache_path = __base_path.parent / 'data/audio_cache.json'
+	_legacy_dj_channels_path = __base_path.parent / 'data/dj_channels.json'
+	_video_titles_path = __base_path.parent / 'data/video_titles.db'
+	_search_cache_path = __base_path.parent / 'data/search_cache.db'
 	_cookies_file_path = __base_path.parent / 'data/cookies.txt'
 
 	music_clients: Dict[int, MusicClient] = {}
 	saved_urls: Dict[int, Dict[str, str]] = {}
-	audio_cache: Dict[str, Union[Track, Playlist]] = {}
+	saved_names_indexes: Dict[int, NamesIndex] = {}
+	saved_url_names: Dict[int, Dict[str, Set[str]]] = {}
+	audio_cache: AudioCache = AudioCache(_audio_cache_path)
+	video_titles: CacheStore = CacheStore(_video_titles_path)
+	search_cache: SearchCache = SearchCache(_search_cache_path)
+	guild_store: GuildStore = GuildStore(_guilds_path)
 	dj_channels: Dict[int, discord.TextChannel] = {}
 
+	@staticmethod
+	def get_guild_id(ctx: Union[discord.ApplicationContext, LightContext, discord.AutocompleteContext]) -> int:
+		return ctx.interaction.guild.id if isinstance(ctx, discord.AutocompleteContext) else ctx.guild.id
+
 	@classmethod
 	def get_guild_saved_urls(cls, ctx: Union[discord.ApplicationContext, LightContext, discord.AutocompleteContext]) -> Dict[str, str]:
-		guild_id = ctx.interaction.guild.id if isinstance(ctx, discord.AutocompleteContext) else ctx.guild.id
+		guild_id = cls.get_guild_id(ctx)
 
 		if guild_id not in cls.saved_urls:
 			cls.saved_urls[guild_id] = {}
@@ -33,81 +48,177 @@ class Storage:
 		return cls.saved_urls[guild_id]
 
 	@classmethod
-	def prepare_path(cls) -> None:
-		if not os.path.exists(directory := os.path.split(cls._saved_urls_path)[0]):
-			os.mkdir(directory)
+	def get_guild_names_index(cls, ctx: Union[discord.ApplicationContext, LightContext, discord.AutocompleteContext]) -> NamesIndex:
+		guild_id = cls.get_guild_id(ctx)
 
-		for path in cls._saved_urls_path, cls._audio_cache_path, cls._dj_channels_path:
-			if not os.path.exists(path):
-				with open(path, 'w', encoding='utf-8') as file:
-					json.dump({}, file)
+		if guild_id not in cls.saved_names_indexes:
+			cls.saved_names_indexes[guild_id] = NamesIndex(
+				cls.get_guild_saved_urls(ctx), 
+				Config.ignore_case_names_search
+			)
+
+		return cls.saved_names_indexes[guild_id]
+
+	@staticmethod
+	def build_url_names(urls_data: Dict[str, str]) -> Dict[str, Set[str]]:
+		url_names: Dict[str, Set[str]] = {}
+		for name, url in urls_data.items():
+			url_names.setdefault(url, set()).add(name)
+		return url_names
 
 	@classmethod
-	async def save_urls(cls) -> None:
-		cls.prepare_path()
-		saved_urls = {str(guild_id): urls_data for guild_id, urls_data in cls.saved_urls.items()}
-		with open(cls._saved_urls_path, 'w', encoding='utf-8') as file:
-			file.write(json.dumps(saved_urls, indent=4, ensure_ascii=False))
+	def get_guild_url_names(cls, ctx: Union[discord.ApplicationContext, LightContext, discord.AutocompleteContext]) -> Dict[str, Set[str]]:
+		guild_id = cls.get_guild_id(ctx)
+
+		if guild_id not in cls.saved_url_names:
+			cls.saved_url_names[guild_id] = cls.build_url_names(cls.get_guild_saved_urls(ctx))
+
+		return cls.saved_url_names[guild_id]
 
 	@classmethod
-	async def save_audio_cache(cls) -> None:
-		cls.prepare_path()
-		cache_dict = {url: cache_item.get_dict() for url, cache_item in cls.audio_cache.items()}
-		with open(cls._audio_cache_path, 'w', encoding='utf-8') as file:
-			file.write(json.dumps(cache_dict, indent=4, ensure_ascii=False))
+	def get_names_for_url(cls, ctx: Union[discord.ApplicationContext, LightContext], url: str) -> List[str]:
+		return sorted(cls.get_guild_url_names(ctx).get(url, ()))
 
 	@classmethod
-	async def save_dj_channels(cls) -> None:
-		cls.prepare_path()
-		channels = {str(guild_id): channel.id for guild_id, channel in cls.dj_channels.items()}
-		with open(cls._dj_channels_path, 'w', encoding='utf-8') as file:
-			file.write(json.dumps(channels, indent=4, ensure_ascii=False))
+	def add_saved_url(cls, ctx: Union[discord.ApplicationContext, LightContext], name: str, url: str) -> None:
+		cls.get_guild_saved_urls(ctx)[name] = url
+		cls.get_guild_names_index(ctx).add(name)
+		cls.get_guild_url_names(ctx).setdefault(url, set()).add(name)
+		cls.save_guild_data(cls.get_guild_id(ctx))
 
 	@classmethod
-	async def load_urls(cls) -> None:
+	def remove_saved_url(cls, ctx: Union[discord.ApplicationContext, LightContext], name: str) -> None:
+		url = cls.get_guild_saved_urls(ctx).pop(name)
+		cls.get_guild_names_index(ctx).remove(name)
+
+		url_names = cls.get_guild_url_names(ctx)
+		if url in url_names:
+			url_names[url].discard(name)
+			if not url_names[url]:
+				url_names.pop(url)
+		cls.save_guild_data(cls.get_guild_id(ctx))
+
+	@classmethod
+	def register_metrics(cls) -> None:
+		Metrics.audio_cache_entries.set_function(lambda: len(cls.audio_cache))
+		Metrics.music_clients_active.set_function(
+			lambda: sum(music_client.is_started for music_client in cls.music_clients.values())
+		)
+		Metrics.queue_tracks.set_function(
+			lambda: sum(len(music_client.queue) for music_client in cls.music_clients.values())
+		)
+		Metrics.queue_tracks_max.set_function(
+			lambda: max((len(music_client.queue) for music_client in cls.music_clients.values()), default=0)
+		)
+
+	@classmethod
+	def prepare_path(cls) -> None:
+		os.makedirs(cls._data_path, exist_ok=True)
+
+	@classmethod
+	def get_guild_data(cls, guild_id: int) -> dict | None:
+		saved_urls = cls.saved_urls.get(guild_id)
+		channel = cls.dj_channels.get(guild_id)
+		if not saved_urls and not channel:
+			return None
+		return {
+			'saved_urls': saved_urls or {},
+			'dj_channel': channel.id if channel else None
+		}
+
+	@classmethod
+	def save_guild_data(cls, guild_id: int) -> None:
+		cls.guild_store.update(guild_id, cls.get_guild_data(guild_id))
+
+	@classmethod
+	async def load_guild_data(cls, bot: discord.Bot) -> None:
 		cls.prepare_path()
 
 		try:
-			with open(cls._saved_urls_path, 'r', encoding='utf-8') as file:
-				raw_saved_urls = json.load(file)
-				cls.saved_urls = {
-					int(guild_id): urls_data
-					for guild_id, urls_data in raw_saved_urls.items()
-				}
+			is_new_store = not os.path.isdir(cls._guilds_path)
+			guilds_data = cls.guild_store.load()
+			if is_new_store:
+				guilds_data.update(cls.import_legacy_guild_data())
 		except Exception as e:
-			print(f'Error loading saved urls from file {cls._saved_urls_path}: {e}')
+			print(f'Error loading guild data from directory {cls._guilds_path}: {e}')
+			return
+
+		cls.saved_urls = {
+			guild_id: data['saved_urls']
+			for guild_id, data in guilds_data.items()
+			if data.get('saved_urls')
+		}
+		cls.saved_names_indexes = {
+			guild_id: NamesIndex(urls_data, Config.ignore_case_names_search)
+			for guild_id, urls_data in cls.saved_urls.items()
+		}
+		cls.saved_url_names = {
+			guild_id: cls.build_url_names(urls_data)
+			for guild_id, urls_data in cls.saved_urls.items()
+		}
+		cls.dj_channels = {
+			guild_id: channel
+			for guild_id, data in guilds_data.items()
+			if data.get('dj_channel') and (channel := bot.get_channel(data['dj_channel']))
+		}
+
+	@classmethod
+	def import_legacy_guild_data(cls) -> Dict[int, dict]:
+		guilds_data: Dict[int, dict] = {}
+
+		for path, key in (cls._legacy_saved_urls_path, 'saved_urls'), (cls._legacy_dj_channels_path, 'dj_channel'):
+			if not os.path.exists(path):
+				continue
+			with open(path, 'r', encoding='utf-8') as file:
+				for guild_id, value in json.load(file).items():
+					guild_data = guilds_data.setdefault(int(guild_id), {'saved_urls': {}, 'dj_channel': None})
+					guild_data[key] = value
+
+		for guild_id, guild_data in guilds_data.items():
+			cls.guild_store.update(guild_id, guild_data)
+		cls.guild_store.flush()
+
+		for path in cls._legacy_saved_urls_path, cls._legacy_dj_channels_path:
+			if os.path.exists(path):
+				os.replace(path, f'{path}.bak')
+		return guilds_data
 
 	@classmethod
 	async def load_audio_cache(cls) -> None:
 		cls.prepare_path()
 
 		try:
-			with open(cls._audio_cache_path, 'r', encoding='utf-8') as file:
-				raw_audio_cache = json.load(file)
-
-			for url, data in raw_audio_cache.items():
-				if not data.get('entries'):
-					cls.audio_cache[url] = Track(**data)
-					continue
-				
-				cls.audio_cache[url] = Playlist(
-					url=data.get('url'),
-					title=data.get('title'),
-					entries=[Track(**track_data) for track_data in data.get('entries')]
-				)
+			cls.audio_cache.load()
+			if not cls.audio_cache and os.path.exists(cls._legacy_audio_cache_path):
+				await cls.import_legacy_audio_cache()
 		except Exception as e:
 			print(f'Error loading url cache from file {cls._audio_cache_path}: {e}')
 
 	@classmethod
-	async def load_dj_channels(cls, bot: discord.Bot) -> None:
+	async def import_legacy_audio_cache(cls) -> None:
+		with open(cls._legacy_audio_cache_path, 'r', encoding='utf-8') as file:
+			raw_audio_cache = json.load(file)
+
+		cls.audio_cache.update_many({
+			url: AudioCache.from_dict(data)
+			for url, data in raw_audio_cache.items()
+		})
+		os.replace(cls._legacy_audio_cache_path, f'{cls._legacy_audio_cache_path}.bak')
+
+	@classmethod
+	async def load_video_titles(cls) -> None:
+		cls.prepare_path()
+
+		try:
+			cls.video_titles.load()
+		except Exception as e:
+			print(f'Error loading video titles from file {cls._video_titles_path}: {e}')
+
+	@classmethod
+	async def load_search_cache(cls) -> None:
 		cls.prepare_path()
 
 		try:
-			with open(cls._dj_channels_path, 'r', encoding='utf-8') as file:
-				raw_dj_channels = json.load(file)
-			cls.dj_channels = {
-				int(guild_id): bot.get_channel(channel_id)
-				for guild_id, channel_id in raw_dj_channels.items()
-			}	
+			cls.search_cache.load()
 		except Exception as e:
-			print(f'Error loading dj channels from file {cls._dj_channels_path}: {e}')
\ No newline at end of file
+			print(f'Error loading search cache from file {cls._search_cache_path}: {e}')
@@ -0,0 +1,40 @@
+import re
+import time
+import aiohttp
+from urllib.parse import urlparse, parse_qs
+from http_client import HttpClient
+
+
+STREAM_EXPIRE_MARGIN = 30
+HEAD_CHECK_TIMEOUT = 5
+
+_path_expire_pattern = re.compile(r'/expire/(\d+)')
+
+def get_stream_expire_time(url: str) -> int | None:
+	parsed_url = urlparse(url)
+	expire = parse_qs(parsed_url.query).get('expire')
+	if expire and expire[0].isdigit():
+		return int(expire[0])
+	if (match := _path_expire_pattern.search(parsed_url.path)):
+		return int(match.group(1))
+
+def is_stream_expired(url: str, margin: int=STREAM_EXPIRE_MARGIN) -> bool | None:
+	if (expire_time := get_stream_expire_time(url)) is None:
+		return None
+	return expire_time - margin <= time.time()
+
+async def is_stream_url_alive(url: str, margin: int=STREAM_EXPIRE_MARGIN) -> bool:
+	if not url:
+		return False
+	if (expired := is_stream_expired(url, margin)) is not None:
+		return not expired
+
+	try:
+		async with HttpClient.get_session().head(
+			url, 
+			allow_redirects=True, 
+			timeout=aiohttp.ClientTimeout(total=HEAD_CHECK_TIMEOUT)
+		) as response:
+			return response.status < 400 or response.status == 405
+	except Exception:
+		return False
@@ -0,0 +1,91 @@
+import re
+from functools import lru_cache
+from typing import NamedTuple
+from urllib.parse import urlsplit, parse_qs
+
+
+class UrlTypes:
+	TRACK = 'track'
+	PLAYLIST = 'playlist'
+	CHANNEL = 'channel'
+	OTHER = 'other'
+
+class ParsedUrl(NamedTuple):
+	url: str
+	type: str
+	video_id: str = None
+
+	@property
+	def is_playlist(self) -> bool:
+		return self.type in (UrlTypes.PLAYLIST, UrlTypes.CHANNEL)
+
+_youtube_host_pattern = re.compile(r'^(?:www\.|m\.|music\.)?(?:youtube\.com|youtube-nocookie\.com)$')
+_youtube_short_host_pattern = re.compile(r'^(?:www\.)?youtu\.be$')
+_yandex_music_host_pattern = re.compile(r'^music\.yandex\.[a-z]{2,3}$')
+_video_id_pattern = re.compile(r'^[0-9A-Za-z_-]{11}$')
+_video_path_pattern = re.compile(r'^/(?:shorts|embed|v|live)/([0-9A-Za-z_-]{11})')
+_channel_path_pattern = re.compile(r'^/(?:@[^/]+|channel/[^/]+|c/[^/]+|user/[^/]+)(?:/[^/]+)?$')
+_yandex_track_path_pattern = re.compile(r'^/(?:album/\d+/)?track/\d+$')
+_timecode_pattern = re.compile(r'^(?:(\d+)h)?(?:(\d+)m)?(?:(\d+)s?)?$')
+_legacy_playlist_markers = ('/playlist', '/channel', '@', '/videos')
+_legacy_playlist_suffixes = ('/videos', '/shorts')
+
+def _get_timecode(query: dict) -> int | None:
+	value = (query.get('t') or query.get('start') or [''])[0]
+	if not value or not (match := _timecode_pattern.match(value)):
+		return None
+	hours, minutes, seconds = (int(group or 0) for group in match.groups())
+	return hours * 3600 + minutes * 60 + seconds or None
+
+def _parse_youtube_video(video_id: str, query: dict) -> ParsedUrl:
+	url = f'https://youtu.be/{video_id}'
+	if (timecode := _get_timecode(query)):
+		url += f'?t={timecode}'
+	return ParsedUrl(url, UrlTypes.TRACK, video_id)
+
+def _parse_youtube_url(host: str, path: str, query: dict) -> ParsedUrl | None:
+	if _youtube_short_host_pattern.match(host):
+		# older versions saved short links with the timecode appended as "&t=" to the path
+		video_id, _, legacy_query = path.strip('/').split('/')[0].partition('&')
+		query = {**parse_qs(legacy_query), **query}
+		return _parse_youtube_video(video_id, query) if _video_id_pattern.match(video_id) else None
+
+	if path == '/watch' and (video_id := (query.get('v') or [''])[0]) and _video_id_pattern.match(video_id):
+		return _parse_youtube_video(video_id, query)
+	if (match := _video_path_pattern.match(path)):
+		return _parse_youtube_video(match.group(1), query)
+	if path == '/playlist' and (playlist_id := (query.get('list') or [''])[0]):
+		return ParsedUrl(f'https://www.youtube.com/playlist?list={playlist_id}', UrlTypes.PLAYLIST)
+	if _channel_path_pattern.match(path):
+		return ParsedUrl(f'https://www.youtube.com{path}', UrlTypes.CHANNEL)
+
+def _parse_yandex_music_url(host: str, path: str) -> ParsedUrl:
+	url_type = UrlTypes.TRACK if _yandex_track_path_pattern.match(path) else UrlTypes.PLAYLIST
+	return ParsedUrl(f'https://{host}{path}', url_type)
+
+def _parse_other_url(url: str) -> ParsedUrl:
+	is_playlist = (
+		any(marker in url for marker in _legacy_playlist_markers)
+		or url.endswith(_legacy_playlist_suffixes)
+	)
+	return ParsedUrl(url, UrlTypes.PLAYLIST if is_playlist else UrlTypes.OTHER)
+
+@lru_cache(maxsize=4096)
+def parse_url(url: str) -> ParsedUrl:
+	url = url.strip()
+
+	try:
+		split_url = urlsplit(url if '://' in url else f'https://{url}')
+		host = (split_url.hostname or '').lower()
+	except ValueError:
+		return _parse_other_url(url)
+
+	path = split_url.path.rstrip('/') or '/'
+
+	if _youtube_host_pattern.match(host) or _youtube_short_host_pattern.match(host):
+		if (parsed_url := _parse_youtube_url(host, path, parse_qs(split_url.query))):
+			return parsed_url
+	elif _yandex_music_host_pattern.match(host):
+		return _parse_yandex_music_url(host, path)
+
+	return _parse_other_url(url)
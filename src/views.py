@@ -27,7 +27,7 @@ class ChoicePlayOptionView(View):
 			label=translate(LocaleKeys.Label.cancel), 
 			style=discord.ButtonStyle.red
 		)
-		self.result = None
+		self.result: asyncio.Future = asyncio.get_running_loop().create_future()
 
 		buttons = (add_button, insert_button, mix_with_queue_button, cancel_button)
 		for button in buttons:
@@ -35,16 +35,20 @@ class ChoicePlayOptionView(View):
 		super().__init__(*buttons, timeout=timeout)
 
 	async def on_timeout(self) -> None:
-		self.result = AddTrackTypes.ADD
+		await self.set_result(AddTrackTypes.ADD)
 
 	async def callback(self, interaction: discord.Interaction) -> None:
-		self.result = int(interaction.custom_id)
+		await self.set_result(int(interaction.custom_id))
+
+	async def set_result(self, value: int) -> None:
+		if not self.result.done():
+			self.result.set_result(value)
+		self.stop()
 
 	async def wait_result(self) -> int:
-		while self.result == None:
-			await asyncio.sleep(.05)
+		result = await self.result
 		await self.message.delete()
-		return self.result
+		return result
 
 class AskYesNoView(View):
 	def __init__(self, timeout: int=60) -> None:
@@ -52,17 +56,18 @@ class AskYesNoView(View):
 		self.no_button = Button(label=translate(LocaleKeys.Label.no), style=discord.ButtonStyle.red)
 		self.yes_button.callback = lambda _: self.set_result(True)
 		self.no_button.callback = lambda _: self.set_result(False)
-		self.result = None
+		self.result: asyncio.Future = asyncio.get_running_loop().create_future()
 		super().__init__(self.yes_button, self.no_button, timeout=timeout)
 
 	async def on_timeout(self) -> None:
-		self.result = False
+		await self.set_result(False)
 
 	async def set_result(self, value: bool) -> None:
-		self.result = value
+		if not self.result.done():
+			self.result.set_result(value)
+		self.stop()
 
 	async def wait_result(self) -> bool:
-		while self.result == None:
-			await asyncio.sleep(.05)
+		result = await self.result
 		await self.message.delete()
-		return self.result
\ No newline at end of file
+		return result
\ No newline at end of file